@@ -0,0 +1,197 @@
+"""Admission control for expensive Query Assistant work.
+
+Two kinds of jobs are limited per server process:
+
+* interactive: answering a question (LLM calls), many at a time
+* bulk: building a document index (PDF extraction and embedding), few at
+  a time, so a user ingesting several large PDFs cannot take the CPU and
+  API quota from people asking questions
+
+Each user has a token bucket per kind (REPP_QUERY_RATE questions per
+minute and REPP_INGEST_RATE new documents per hour, with bursts), and each
+kind has its own pool of slots (REPP_INTERACTIVE_SLOTS, REPP_BULK_SLOTS),
+so bulk work never queues in front of interactive work. When a pool is
+full, jobs wait in a fair-share queue: the next slot goes to the waiting
+user with the fewest jobs running and, among those, the one served least
+recently, so users take turns however many jobs each has queued.
+
+Wait times are recorded as the ``<kind>_queue_wait`` stage in rag_metrics,
+and stats() reports queue depths for the admin panel.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from rag_metrics import METRICS
+
+QUERY_RATE = float(os.getenv("REPP_QUERY_RATE", "20"))  # per minute
+QUERY_BURST = int(os.getenv("REPP_QUERY_BURST", "5"))
+INGEST_RATE = float(os.getenv("REPP_INGEST_RATE", "10"))  # per hour
+INGEST_BURST = int(os.getenv("REPP_INGEST_BURST", "3"))
+INTERACTIVE_SLOTS = int(os.getenv("REPP_INTERACTIVE_SLOTS", "8"))
+BULK_SLOTS = int(os.getenv("REPP_BULK_SLOTS", "1"))
+QUEUE_TIMEOUT = float(os.getenv("REPP_QUEUE_TIMEOUT", "120"))
+
+# Buckets of users not seen for a while are forgotten beyond this many
+MAX_TRACKED_USERS = 10000
+
+
+class AdmissionError(Exception):
+    """A job was not admitted; the message is safe to show to the user."""
+
+
+class RateLimited(AdmissionError):
+    def __init__(self, kind, retry_after):
+        super().__init__(f"Too many {kind} requests, please try again in {retry_after:.0f} seconds.")
+        self.retry_after = retry_after
+
+
+class QueueTimeout(AdmissionError):
+    pass
+
+
+class TokenBucket:
+    """``capacity`` tokens, refilled at ``rate`` tokens per second."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self, cost=1.0):
+        """Take ``cost`` tokens; returns 0 on success, else seconds until possible."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Per-user token buckets for one kind of job."""
+
+    def __init__(self, kind, rate, burst):
+        self.kind = kind
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def check(self, user, cost=1.0):
+        """Charge ``user``; raises RateLimited when the bucket is empty."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.pop(user, None) or TokenBucket(self.rate, self.burst)
+            self._buckets[user] = bucket
+            while len(self._buckets) > MAX_TRACKED_USERS:
+                self._buckets.popitem(last=False)
+            retry_after = bucket.take(cost)
+        if retry_after:
+            raise RateLimited(self.kind, retry_after)
+
+
+class _Waiter:
+    __slots__ = ("user", "granted", "since")
+
+    def __init__(self, user):
+        self.user = user
+        self.granted = threading.Event()
+        self.since = time.monotonic()
+
+
+class FairQueue:
+    """A pool of slots handed out fairly between users."""
+
+    def __init__(self, kind, slots):
+        self.kind = kind
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._running = defaultdict(int)
+        self._last_served = {}
+        self._served = 0
+        self._active = 0
+        self._waiting = []
+
+    def _grant(self, waiter):
+        self._active += 1
+        self._running[waiter.user] += 1
+        self._served += 1
+        self._last_served[waiter.user] = self._served
+        waiter.granted.set()
+
+    def _turn(self, waiter):
+        return (self._running.get(waiter.user, 0), self._last_served.get(waiter.user, 0), waiter.since)
+
+    def _release(self, user):
+        with self._lock:
+            self._active -= 1
+            self._running[user] -= 1
+            if not self._running[user]:
+                del self._running[user]
+                if not any(w.user == user for w in self._waiting):
+                    del self._last_served[user]
+            if self._waiting and self._active < self.slots:
+                waiter = min(self._waiting, key=self._turn)
+                self._waiting.remove(waiter)
+                self._grant(waiter)
+
+    def slot(self, user, timeout=QUEUE_TIMEOUT):
+        """Context manager holding one slot for ``user``'s job."""
+        return _Slot(self, user, timeout)
+
+    def stats(self):
+        with self._lock:
+            oldest = min((w.since for w in self._waiting), default=None)
+            return {
+                "kind": self.kind,
+                "slots": self.slots,
+                "running": self._active,
+                "queued": len(self._waiting),
+                "oldest_wait_s": round(time.monotonic() - oldest, 2) if oldest is not None else 0.0,
+            }
+
+
+class _Slot:
+    def __init__(self, queue, user, timeout):
+        self.queue = queue
+        self.user = user
+        self.timeout = timeout
+
+    def __enter__(self):
+        queue = self.queue
+        waiter = _Waiter(self.user)
+        with METRICS.stage(f"{queue.kind}_queue_wait"):
+            with queue._lock:
+                if queue._active < queue.slots and not queue._waiting:
+                    queue._grant(waiter)
+                else:
+                    queue._waiting.append(waiter)
+            if not waiter.granted.wait(self.timeout):
+                with queue._lock:
+                    if not waiter.granted.is_set():
+                        queue._waiting.remove(waiter)
+                        raise QueueTimeout("The server is busy, please try again in a moment.")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.queue._release(self.user)
+        return False
+
+
+QUERY_LIMITER = RateLimiter("question", QUERY_RATE / 60, QUERY_BURST)
+INGEST_LIMITER = RateLimiter("document upload", INGEST_RATE / 3600, INGEST_BURST)
+INTERACTIVE = FairQueue("interactive", INTERACTIVE_SLOTS)
+BULK = FairQueue("bulk", BULK_SLOTS)
+
+
+def stats():
+    """Queue depth and occupancy of both pools, for the admin panel."""
+    return [INTERACTIVE.stats(), BULK.stats()]
@@ -0,0 +1,191 @@
+"""Append-only analytics of Query Assistant activity, stored in MySQL.
+
+Each document open ("ingest") and each question ("query") becomes one row
+in ``rag_events``: document hash, hash of the normalized question, stage
+timings, tokens and the cache outcome. The rows show how often indexes
+are served from memory, disk or rebuilt, which is what the index cache
+size and warmup.py's preload list should be tuned from.
+
+record() never blocks the request: events go into a bounded in-memory
+queue (REPP_ANALYTICS_QUEUE) and are dropped, and counted, when it is
+full. A background thread writes them with one executemany() per batch
+of up to BATCH_SIZE events, or every FLUSH_INTERVAL seconds. The sink is
+active when the DB_* settings used by mainapp.py are present and
+REPP_ANALYTICS is not 0.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+ANALYTICS_ENABLED = os.getenv("REPP_ANALYTICS", "1") not in ("", "0") and bool(os.getenv("DB_HOST"))
+QUEUE_SIZE = int(os.getenv("REPP_ANALYTICS_QUEUE", "10000"))
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2.0
+RETRY_INTERVAL = 30.0
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS rag_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    created_at DATETIME(3) NOT NULL,
+    event VARCHAR(16) NOT NULL,
+    doc_hash CHAR(64) NULL,
+    query_hash CHAR(64) NULL,
+    cache VARCHAR(16) NULL,
+    tokens INT NOT NULL DEFAULT 0,
+    total_ms DOUBLE NOT NULL DEFAULT 0,
+    stages_ms TEXT NULL,
+    INDEX idx_rag_events_created (created_at),
+    INDEX idx_rag_events_doc (doc_hash, created_at)
+)
+"""
+
+INSERT_EVENT = (
+    "INSERT INTO rag_events (created_at, event, doc_hash, query_hash, cache, tokens, total_ms, stages_ms) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+def _connect():
+    import mysql.connector
+    return mysql.connector.connect(
+        host=os.getenv("DB_HOST"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        database=os.getenv("DB_NAME")
+    )
+
+
+def query_hash(query):
+    """Hash of a question, insensitive to case and spacing (see singleflight.py)."""
+    from singleflight import normalize_query
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+
+class AnalyticsSink:
+    """Bounded queue of events drained in bulk by one writer thread."""
+
+    def __init__(self, connect=_connect, maxsize=QUEUE_SIZE, enabled=ANALYTICS_ENABLED):
+        self.enabled = enabled
+        self._connect = connect
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def record(self, event, doc_hash=None, query=None, trace=None, cache=None):
+        """Queue one event; returns False if it was dropped."""
+        if not self.enabled:
+            return False
+        row = (
+            datetime.now(timezone.utc).replace(tzinfo=None),
+            event,
+            doc_hash,
+            query_hash(query) if query else None,
+            cache,
+            trace.tokens if trace is not None else 0,
+            trace.total_ms if trace is not None else 0.0,
+            json.dumps(trace.stages_ms) if trace is not None else None,
+        )
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.recorded += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "recorded": self.recorded,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="repp-analytics", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _next_batch(self):
+        """Block for the first event, then gather more until full or timed out."""
+        try:
+            batch = [self._queue.get(timeout=FLUSH_INTERVAL)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, connection, batch):
+        cursor = connection.cursor()
+        try:
+            cursor.executemany(INSERT_EVENT, batch)
+            connection.commit()
+        finally:
+            cursor.close()
+
+    def _run(self):
+        connection = None
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                if connection is None or not connection.is_connected():
+                    connection = self._connect()
+                    cursor = connection.cursor()
+                    cursor.execute(CREATE_TABLE)
+                    cursor.close()
+                self._write(connection, batch)
+                with self._lock:
+                    self.written += len(batch)
+            except Exception as err:
+                # Analytics must never take the app down; drop the batch and back off
+                print(f"Analytics write failed, dropped {len(batch)} events: {err}")
+                with self._lock:
+                    self.failed += len(batch)
+                connection = None
+                self._stopping.wait(RETRY_INTERVAL)
+        if connection is not None:
+            connection.close()
+
+    def close(self, timeout=5.0):
+        """Flush what is queued and stop the writer thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+SINK = AnalyticsSink()
+
+
+def record(event, doc_hash=None, query=None, trace=None, cache=None):
+    """Queue an analytics event on the process-wide sink."""
+    return SINK.record(event, doc_hash=doc_hash, query=query, trace=trace, cache=cache)
@@ -0,0 +1,185 @@
+"""Persistent catalog of the files users upload to their project pages.
+
+Uploaded dashboards, datasets, presentations and gallery images used to
+live only as Streamlit ``UploadedFile`` objects in the session, so they
+were lost on every restart and each page walked the whole list on every
+rerun. Now each upload is written once:
+
+* the content goes to a content-addressed store under REPP_ARTIFACT_DIR
+  (``<sha256[:2]>/<sha256>``), so the same file uploaded twice is stored once
+* one row goes to a SQLite catalog (REPP_CATALOG_PATH) with the owner,
+  section, name, MIME type, size, content hash and upload time
+
+Pages list a section with keyset pagination on the indexed
+``(owner, section, id)`` columns, optionally filtered by type (also
+indexed) or a name substring, so a page costs the same however many files
+a user has and never reads file contents. Artifact.getvalue() reads the
+content only when a page actually shows or offers the file.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+ARTIFACT_DIR = os.getenv("REPP_ARTIFACT_DIR", "artifacts")
+CATALOG_PATH = os.getenv("REPP_CATALOG_PATH", os.path.join(ARTIFACT_DIR, "catalog.db"))
+PAGE_SIZE = int(os.getenv("REPP_CATALOG_PAGE_SIZE", "20"))
+
+SECTIONS = ("dashboards", "datasets", "presentations", "images")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    section TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    UNIQUE (owner, section, sha256, name)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_listing ON artifacts (owner, section, id);
+CREATE INDEX IF NOT EXISTS idx_artifacts_type ON artifacts (owner, section, type, id);
+"""
+
+COLUMNS = "id, owner, section, name, type, size, sha256, uploaded_at"
+
+
+class Artifact:
+    """One catalog row; quacks like an UploadedFile for static_export.py."""
+
+    __slots__ = ("id", "owner", "section", "name", "type", "size", "sha256", "uploaded_at", "path")
+
+    def __init__(self, id, owner, section, name, type, size, sha256, uploaded_at, store_dir=ARTIFACT_DIR):
+        self.id = id
+        self.owner = owner
+        self.section = section
+        self.name = name
+        self.type = type
+        self.size = size
+        self.sha256 = sha256
+        self.uploaded_at = uploaded_at
+        self.path = blob_path(store_dir, sha256)
+
+    def getvalue(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+def blob_path(store_dir, sha256):
+    return os.path.join(store_dir, sha256[:2], sha256)
+
+
+def _file_bytes(uploaded_file):
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+
+class ArtifactCatalog:
+    """SQLite catalog plus content-addressed file store, shared by all sessions."""
+
+    def __init__(self, path=CATALOG_PATH, store_dir=ARTIFACT_DIR):
+        self.path = path
+        self.store_dir = store_dir
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        # One connection per process, serialized by the lock; Streamlit runs
+        # each session's script in its own thread
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+
+    def _store(self, data, sha256):
+        path = blob_path(self.store_dir, sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return path
+
+    def add(self, owner, section, uploaded_file):
+        """Store and catalog one upload; returns its Artifact.
+
+        Uploading the same content under the same name to the same section
+        again returns the existing row instead of adding another.
+        """
+        if section not in SECTIONS:
+            raise ValueError(f"Unknown artifact section: {section}")
+        data = _file_bytes(uploaded_file)
+        sha256 = hashlib.sha256(data).hexdigest()
+        self._store(data, sha256)
+        row = (
+            owner,
+            section,
+            uploaded_file.name,
+            getattr(uploaded_file, "type", None) or "application/octet-stream",
+            len(data),
+            sha256,
+            datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        )
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO artifacts (owner, section, name, type, size, sha256, uploaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                row
+            )
+            found = self._connection.execute(
+                f"SELECT {COLUMNS} FROM artifacts WHERE owner = ? AND section = ? AND sha256 = ? AND name = ?",
+                (owner, section, sha256, uploaded_file.name)
+            ).fetchone()
+        return Artifact(*found, store_dir=self.store_dir)
+
+    def page(self, owner, section, after=None, limit=PAGE_SIZE, type=None, name_contains=None):
+        """Newest first page of ``section``; returns ``(artifacts, next_after)``.
+
+        ``after`` is the ``next_after`` of the previous page (None for the
+        first); ``next_after`` is None on the last page.
+        """
+        where = ["owner = ?", "section = ?"]
+        params = [owner, section]
+        if type:
+            where.append("type = ?")
+            params.append(type)
+        if name_contains:
+            where.append("instr(lower(name), ?) > 0")
+            params.append(name_contains.lower())
+        if after is not None:
+            where.append("id < ?")
+            params.append(after)
+        # One extra row tells whether another page follows
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {COLUMNS} FROM artifacts WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?",
+                params
+            ).fetchall()
+        artifacts = [Artifact(*row, store_dir=self.store_dir) for row in rows[:limit]]
+        next_after = artifacts[-1].id if len(rows) > limit else None
+        return artifacts, next_after
+
+    def all(self, owner, section):
+        """Every artifact of ``section``, oldest first (for the static export)."""
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {COLUMNS} FROM artifacts WHERE owner = ? AND section = ? ORDER BY id",
+                (owner, section)
+            ).fetchall()
+        return [Artifact(*row, store_dir=self.store_dir) for row in rows]
+
+    def types(self, owner, section):
+        """Distinct MIME types in ``section``, for the type filter."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT type FROM artifacts WHERE owner = ? AND section = ? ORDER BY type",
+                (owner, section)
+            ).fetchall()
+        return [row[0] for row in rows]
+
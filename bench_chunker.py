@@ -0,0 +1,132 @@
+"""Throughput benchmark of document chunking.
+
+Compares the token-aware chunker in chunker.py with the character-based
+RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50) it
+replaced, on the same generated page texts. Reports MB/s and chunks/s,
+and the spread of tokens per chunk. The token-aware chunker cuts each
+chunk from at most CHUNK_TOKENS tokens of the running text and fills all
+but the last to at least MIN_FILL of that; re-encoding a chunk on its own,
+as measured here, can come out a token over. The character splitter
+bounds characters, not tokens.
+
+Usage:
+    python bench_chunker.py
+    python bench_chunker.py --pages 100 1000 5000 --repeat 3 --output chunker.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from bench_rag import LINES_PER_PAGE, VOCABULARY, WORDS_PER_LINE, _git_commit
+
+DEFAULT_PAGES = [100, 1000, 5000]
+
+
+def make_pages(pages, seed=0):
+    """Page texts shaped like PdfReader output: short lines, some paragraphs."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(LINES_PER_PAGE):
+            words = [rng.choice(VOCABULARY) for _ in range(rng.randint(WORDS_PER_LINE // 2, WORDS_PER_LINE))]
+            end = "." if rng.random() < 0.6 else ""
+            lines.append(" ".join(words).capitalize() + end)
+            if end and rng.random() < 0.15:
+                lines.append("")
+        texts.append("\n".join(lines))
+    return texts
+
+
+def old_splitter(pages):
+    # What rag_pipeline did before chunker.py: join, flatten newlines and
+    # build a new splitter for every document
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    text = " ".join(pages).replace("\n", " ").strip()
+    return RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50).split_text(text)
+
+
+def new_chunker(pages):
+    import chunker
+
+    return chunker.chunk_pages(pages)
+
+
+def _token_spread(chunks):
+    from chunker import default_chunker
+
+    counts = default_chunker().count(chunks)
+    return {
+        "mean": round(statistics.fmean(counts), 1),
+        "stdev": round(statistics.pstdev(counts), 1),
+        "min": min(counts),
+        "max": max(counts),
+    }
+
+
+def run(split, pages, repeat):
+    text_bytes = sum(len(page.encode("utf-8")) for page in pages)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = split(pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "seconds": round(best, 4),
+        "mb_per_s": round(text_bytes / best / 1e6, 2),
+        "chunks": len(chunks),
+        "chunks_per_s": round(len(chunks) / best, 1),
+        "tokens_per_chunk": _token_spread(chunks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark of document chunking.")
+    parser.add_argument("--pages", type=int, nargs="+", default=DEFAULT_PAGES, help="document sizes in pages")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    import chunker
+
+    # Load the tokenizer up front so it is not timed as part of the first run
+    encoding = chunker.default_chunker().encoding
+    results = []
+    for page_count in args.pages:
+        pages = make_pages(page_count, args.seed)
+        results.append({
+            "pages": page_count,
+            "text_bytes": sum(len(page.encode("utf-8")) for page in pages),
+            "recursive_character_splitter": run(old_splitter, pages, args.repeat),
+            "token_chunker": run(new_chunker, pages, args.repeat),
+        })
+        print(f"{page_count} pages done", file=sys.stderr)
+
+    report = {
+        "benchmark": "chunker",
+        "commit": _git_commit(),
+        "tokenizer": encoding.name if encoding is not None else "chars/4 estimate",
+        "config": {
+            "chunk_tokens": chunker.CHUNK_TOKENS,
+            "overlap_tokens": chunker.OVERLAP_TOKENS,
+            "min_fill": chunker.MIN_FILL,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
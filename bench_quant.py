@@ -0,0 +1,151 @@
+"""Recall and memory benchmark for compressed index storage.
+
+For every storage mode in quantized_index.py this builds an index over the
+same vectors and reports resident index size, compression against flat
+float32, query latency and recall@k against an exact flat search, both
+for the compressed index alone and with exact re-ranking from the
+original vectors (what the Query Assistant uses).
+
+Vectors come from synthetic chunks embedded with the offline fakes, or
+from existing flat indexes such as the shipped db/ and faiss_index/ (then
+queries are stored vectors with a little noise added).
+
+Usage:
+    python bench_quant.py
+    python bench_quant.py --chunks 20000 --k 5 --output quant.json
+    python bench_quant.py --index db faiss_index
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from bench_rag import QUESTION_TEMPLATES, VOCABULARY, _git_commit
+from quantized_index import STORAGE_MODES, index_memory_bytes, quantize_store
+
+WORDS_PER_CHUNK = 80
+
+
+def synthetic_store(chunks, queries, dim, seed):
+    """Flat store, original vectors and query vectors for generated text."""
+    from langchain_community.vectorstores import FAISS
+    from rag_fakes import FakeEmbeddings
+
+    rng = random.Random(seed)
+    texts = [" ".join(rng.choice(VOCABULARY) for _ in range(WORDS_PER_CHUNK)) for _ in range(chunks)]
+    embeddings = FakeEmbeddings(size=dim)
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+    store = FAISS.from_embeddings(list(zip(texts, vectors.tolist())), embeddings)
+    questions = []
+    for _ in range(queries):
+        template = rng.choice(QUESTION_TEMPLATES)
+        questions.append(template.format(*(rng.choice(VOCABULARY) for _ in range(template.count("{}")))))
+    query_vectors = np.asarray([embeddings.embed_query(q) for q in questions], dtype="float32")
+    return store, vectors, query_vectors
+
+
+def saved_store(path, queries, seed):
+    """Flat store loaded from ``path``; queries are perturbed stored vectors."""
+    from langchain_community.vectorstores import FAISS
+    from rag_fakes import FakeEmbeddings
+
+    store = FAISS.load_local(path, FakeEmbeddings(), allow_dangerous_deserialization=True)
+    vectors = store.index.reconstruct_n(0, store.index.ntotal)
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), size=queries)]
+    noise = rng.normal(0, picks.std(), size=picks.shape).astype("float32") * 0.5
+    return store, vectors, picks + noise
+
+
+def _recall(vectors, query_vectors, found, truth_distances):
+    """Share of returned rows that are true k nearest neighbours.
+
+    Judged by exact distance against the k-th true distance, so ties
+    between equally close chunks are not counted as misses.
+    """
+    hits = []
+    for query, rows, kth in zip(query_vectors, found, truth_distances[:, -1]):
+        distances = ((vectors[rows] - query) ** 2).sum(axis=1)
+        hits.append(np.count_nonzero(distances <= kth * (1 + 1e-5) + 1e-6) / len(truth_distances[0]))
+    return statistics.fmean(hits)
+
+
+def run_modes(store, vectors, query_vectors, k):
+    truth_distances, _ = store.index.search(query_vectors, k)
+    # Older saved documents have no ID, so map results back to rows by identity
+    row_of = {id(store.docstore.search(doc_id)): row for row, doc_id in store.index_to_docstore_id.items()}
+    flat_bytes = index_memory_bytes(store)
+    results = []
+    for storage in STORAGE_MODES:
+        start = time.perf_counter()
+        quantized = quantize_store(store, storage, vectors) if storage != "flat" else store
+        build_seconds = time.perf_counter() - start
+
+        # Compressed index alone
+        _, approx = quantized.index.search(query_vectors, k)
+        # With exact re-ranking, through the same code path as rag()
+        reranked, latencies = [], []
+        for query in query_vectors:
+            query_start = time.perf_counter()
+            docs = quantized.similarity_search_with_score_by_vector(query.tolist(), k=k)
+            latencies.append(time.perf_counter() - query_start)
+            reranked.append([row_of[id(doc)] for doc, _ in docs])
+
+        memory = index_memory_bytes(quantized)
+        results.append({
+            "storage": storage,
+            "index_type": type(quantized.index).__name__,
+            "build_s": round(build_seconds, 4),
+            "index_bytes": memory,
+            "bytes_per_vector": round(memory / len(vectors), 1),
+            "compression": round(flat_bytes / memory, 2),
+            f"recall@{k}_compressed": round(_recall(vectors, query_vectors, approx, truth_distances), 4),
+            f"recall@{k}_reranked": round(_recall(vectors, query_vectors, reranked, truth_distances), 4),
+            "query_p50_ms": round(statistics.median(latencies) * 1000, 3),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/memory benchmark of compressed FAISS storage.")
+    parser.add_argument("--chunks", type=int, default=5000, help="synthetic chunks to index")
+    parser.add_argument("--index", nargs="+", help="benchmark these saved flat indexes instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5, help="results per query, as in rag()")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension for synthetic chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    datasets = []
+    if args.index:
+        for path in args.index:
+            datasets.append((path, *saved_store(path, args.queries, args.seed)))
+    else:
+        datasets.append((f"synthetic_{args.chunks}", *synthetic_store(args.chunks, args.queries, args.dim, args.seed)))
+
+    report = {"benchmark": "quantized_index", "commit": _git_commit(), "k": args.k, "datasets": []}
+    for name, store, vectors, query_vectors in datasets:
+        report["datasets"].append({
+            "name": name,
+            "vectors": len(vectors),
+            "dim": vectors.shape[1],
+            "modes": run_modes(store, vectors, query_vectors, args.k),
+        })
+        print(f"{name} done", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
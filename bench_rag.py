@@ -0,0 +1,246 @@
+"""End-to-end benchmark of the Query Assistant RAG pipeline, fully offline.
+
+Generates synthetic PDFs, then runs the same steps as the Query Assistant
+page (PdfReader extraction, splitting, embedding, FAISS build/save and
+rag() queries) with the deterministic fakes from rag_fakes.py. Each PDF
+size runs in its own interpreter so peak RSS is measured in isolation.
+Results are printed (or written) as JSON so runs from different commits
+can be compared.
+
+Usage:
+    python bench_rag.py
+    python bench_rag.py --pages 10 100 --queries 20 --chat-latency 0.3 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_PAGES = [10, 100, 1000]
+
+LINES_PER_PAGE = 45
+WORDS_PER_LINE = 14
+
+VOCABULARY = (
+    "revenue growth market share customer retention trend forecast quarter annual "
+    "analysis dataset dashboard model accuracy regression cluster segment survey "
+    "respondents significant increase decrease recommendation finding risk cost "
+    "benefit strategy operations supply demand region product channel pricing "
+    "hospital patient outcome treatment cohort baseline metric variance median "
+    "student course performance teaching evaluation policy impact budget energy"
+).split()
+
+QUESTION_TEMPLATES = [
+    "What are the key findings about {} and {}?",
+    "What are the important trends discussed for {}?",
+    "What are the recommendations regarding {} {}?",
+    "How does {} affect {} in the report?",
+]
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, seed=0):
+    """Write a simple text-only PDF with ``pages`` pages of pseudo-random prose."""
+    rng = random.Random(seed)
+    page_count = pages
+    # Object numbers: 1 catalog, 2 pages tree, 3 font, then page/content pairs
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for page_number in range(page_count):
+        page_obj = 4 + 2 * page_number
+        content_obj = page_obj + 1
+        kids.append(f"{page_obj} 0 R")
+        lines = []
+        for _ in range(LINES_PER_PAGE):
+            words = [rng.choice(VOCABULARY) for _ in range(WORDS_PER_LINE)]
+            lines.append(_pdf_escape(" ".join(words).capitalize() + "."))
+        stream = "BT /F1 10 Tf 12 TL 50 790 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream_bytes = stream.encode("latin-1")
+        objects[page_obj] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_obj} 0 R >>"
+        ).encode("latin-1")
+        objects[content_obj] = b"<< /Length %d >>\nstream\n" % len(stream_bytes) + stream_bytes + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {page_count} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + objects[number] + b"\nendobj\n"
+    xref_offset = len(out)
+    total = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % total
+    for number in range(1, total):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (total, xref_offset)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+    }
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_one(pages, queries, embed_latency, chat_latency, dim, seed):
+    """Benchmark a single PDF size in this process; returns a result dict."""
+    import chunker
+    import rag_pipeline
+    from rag_fakes import FakeChatCompletion, FakeEmbeddings
+    from rag_metrics import METRICS
+
+    workdir = tempfile.mkdtemp(prefix="repp_bench_")
+    try:
+        pdf_path = os.path.join(workdir, f"report_{pages}.pdf")
+        write_pdf(pdf_path, pages, seed=seed)
+        pdf_bytes = os.path.getsize(pdf_path)
+        # Tokenizer tables are built once per process (warmup.py does it at start)
+        chunker.default_chunker()
+        rss_before = _peak_rss_mb()
+        METRICS.reset()
+
+        embeddings = FakeEmbeddings(size=dim, latency=embed_latency)
+        chat = FakeChatCompletion(latency=chat_latency)
+
+        start = time.perf_counter()
+        page_texts = rag_pipeline.extract_pages(pdf_path)
+        chunks = rag_pipeline.split_pages(page_texts)
+        index_dir = os.path.join(workdir, "index")
+        vector_store = rag_pipeline.build_vector_store(chunks, save_path=index_dir, embeddings=embeddings)
+        ingest_seconds = time.perf_counter() - start
+        ingest_stages = {row["stage"]: row["total_s"] for row in METRICS.snapshot()}
+
+        rng = random.Random(seed + 1)
+        latencies = []
+        for _ in range(queries):
+            template = rng.choice(QUESTION_TEMPLATES)
+            question = template.format(*(rng.choice(VOCABULARY) for _ in range(template.count("{}"))))
+            query_start = time.perf_counter()
+            rag_pipeline.rag(vector_store, question, chat=chat.create)
+            latencies.append(time.perf_counter() - query_start)
+
+        stage_rows = {row["stage"]: row for row in METRICS.snapshot()}
+        return {
+            "pages": pages,
+            "pdf_bytes": pdf_bytes,
+            "text_bytes": sum(len(page_text.encode("utf-8")) for page_text in page_texts),
+            "chunks": len(chunks),
+            "ingest": {"total_s": round(ingest_seconds, 4), "stages_s": ingest_stages},
+            "peak_rss_mb": _peak_rss_mb(),
+            "rss_before_ingest_mb": rss_before,
+            "index": {
+                "vectors": vector_store.index.ntotal,
+                "dim": vector_store.index.d,
+                "disk_bytes": _dir_size(index_dir),
+            },
+            "query": _percentiles(latencies) if latencies else None,
+            "query_stages": {
+                name: {key: stage_rows[name][key] for key in ("p50_ms", "p95_ms", "p99_ms", "tokens")}
+                for name in ("similarity_search", "rerank", "llm") if name in stage_rows
+            },
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the RAG pipeline.")
+    parser.add_argument("--pages", type=int, nargs="+", default=DEFAULT_PAGES, help="PDF sizes to benchmark")
+    parser.add_argument("--queries", type=int, default=50, help="rag() calls per PDF")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per fake embedding request")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="seconds per fake chat completion")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_one(args.pages[0], args.queries, args.embed_latency, args.chat_latency, args.dim, args.seed)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for pages in args.pages:
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--worker", "--pages", str(pages),
+            "--queries", str(args.queries), "--embed-latency", str(args.embed_latency),
+            "--chat-latency", str(args.chat_latency), "--dim", str(args.dim), "--seed", str(args.seed),
+        ]
+        proc = subprocess.run(cmd, cwd=APP_DIR, capture_output=True, text=True)
+        if proc.returncode != 0:
+            results.append({"pages": pages, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        print(f"{pages} pages done", file=sys.stderr)
+
+    report = {
+        "benchmark": "rag_pipeline",
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "queries": args.queries,
+            "embed_latency_s": args.embed_latency,
+            "chat_latency_s": args.chat_latency,
+            "dim": args.dim,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Bounded Query Assistant chat history.
+
+Only the most recent HISTORY_WINDOW messages stay in ``st.session_state``;
+older ones are appended to a per-session JSON-lines log on disk and read
+back one page at a time when the user browses older messages. Assistant
+messages keep compact source references (chunk ID and score) that point
+into the document's chunk store instead of full LangChain Documents.
+
+Streamlit gives no hook when a session ends, so prune_logs() deletes logs
+not written to for REPP_CHAT_LOG_MAX_AGE seconds (a day by default).
+mainapp.py calls it when a session starts; it scans at most once per
+PRUNE_INTERVAL per process.
+"""
+
+import json
+import os
+import threading
+import time
+from itertools import islice
+
+CHAT_LOG_DIR = os.getenv("REPP_CHAT_LOG_DIR", "chat_logs")
+HISTORY_WINDOW = int(os.getenv("REPP_CHAT_HISTORY_WINDOW", "20"))
+PAGE_SIZE = 10
+LOG_MAX_AGE = float(os.getenv("REPP_CHAT_LOG_MAX_AGE", str(24 * 60 * 60)))
+PRUNE_INTERVAL = 60 * 60
+
+_prune_lock = threading.Lock()
+_last_prune = None
+
+
+def log_path(session_log_id):
+    """Path of the spill-over log for one browser session."""
+    return os.path.join(CHAT_LOG_DIR, f"{session_log_id}.jsonl")
+
+
+def compact_sources(scored_docs):
+    """Turn ``(Document, score)`` pairs into small JSON-safe references."""
+    sources = []
+    for doc, score in scored_docs:
+        chunk_id = doc.metadata.get("chunk", getattr(doc, "id", None))
+        sources.append({"chunk": chunk_id, "score": round(float(score), 4)})
+    return sources
+
+
+def append_message(history, message, path, window=HISTORY_WINDOW):
+    """Append a message, spilling the oldest ones past ``window`` to ``path``.
+
+    Returns the number of messages moved to disk.
+    """
+    history.append(message)
+    overflow = len(history) - window
+    if overflow <= 0:
+        return 0
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for old_message in history[:overflow]:
+            f.write(json.dumps(old_message) + "\n")
+    del history[:overflow]
+    return overflow
+
+
+def _read_spilled(path, start, stop):
+    if stop <= start or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in islice(f, start, stop)]
+
+
+def page_count(history, spilled, page_size=PAGE_SIZE):
+    total = spilled + len(history)
+    return max(1, -(-total // page_size))
+
+
+def page_messages(history, spilled, path, page, page_size=PAGE_SIZE):
+    """Messages on ``page`` (1-based, oldest first) across disk and memory.
+
+    The last page always ends with the newest message, so only that page
+    is served from memory on a normal rerun.
+    """
+    total = spilled + len(history)
+    stop = max(0, total - (page_count(history, spilled, page_size) - page) * page_size)
+    start = max(0, stop - page_size)
+    messages = _read_spilled(path, start, min(stop, spilled))
+    messages.extend(history[max(0, start - spilled):max(0, stop - spilled)])
+    return messages
+
+
+def clear(path):
+    """Delete the spill-over log for a session."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def prune_logs(max_age=LOG_MAX_AGE, force=False):
+    """Delete session logs untouched for ``max_age`` seconds; returns how many.
+
+    Runs at most once per PRUNE_INTERVAL unless ``force`` is set.
+    """
+    global _last_prune
+    now = time.time()
+    with _prune_lock:
+        if not force and _last_prune is not None and now - _last_prune < PRUNE_INTERVAL:
+            return 0
+        _last_prune = now
+    removed = 0
+    try:
+        entries = list(os.scandir(CHAT_LOG_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.endswith(".jsonl") and now - entry.stat().st_mtime > max_age:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # removed by another worker
+    return removed
@@ -0,0 +1,183 @@
+"""Token-aware chunking of document text for the vector index.
+
+Pages are tokenized with the same tiktoken encoder as conversation.py, a
+batch of pages at a time, and chunks are cut directly on the token arrays:
+each chunk is cut from at most CHUNK_TOKENS tokens of the running text
+and, except for the last one, at least MIN_FILL of that. It ends at the
+last paragraph break or sentence end in that range, else at the last word
+boundary that fits, else at the last token that starts a character, so
+multi-byte UTF-8 characters are never split. The next chunk starts at a
+sentence boundary about OVERLAP_TOKENS tokens back. Sentence ends,
+paragraph breaks, word starts and character starts are found with lookup
+tables over the token vocabulary, so the text is never split into
+Python-level sentences.
+
+The budget is not a hard maximum on the chunk text: re-encoding a chunk
+on its own can merge tokens differently at its edges, typically by one
+token either way.
+
+The input is an iterable of page texts consumed as it streams in, so a
+document is never joined into one string. Without tiktoken, UTF-8 bytes
+stand in for tokens, four to a token as in conversation.py.
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from conversation import get_encoding
+
+CHUNK_TOKENS = int(os.getenv("REPP_CHUNK_TOKENS", "128"))
+OVERLAP_TOKENS = int(os.getenv("REPP_CHUNK_OVERLAP_TOKENS", "16"))
+# A chunk ends on a sentence or paragraph only past this share of CHUNK_TOKENS
+MIN_FILL = 0.75
+BATCH_PAGES = 32
+# tiktoken encodes a batch on this many threads (it releases the GIL)
+ENCODE_THREADS = min(8, os.cpu_count() or 1)
+
+_SENTENCE_STOPS = (b".", b"!", b"?")
+
+
+def _unwrap(page):
+    """Join wrapped lines; a blank line (paragraph break) is kept."""
+    return page.replace("\n\n", "\x00").replace("\n", " ").replace("\x00", "\n\n") + " "
+
+
+def _token_tables(token_bytes):
+    """Per-token flags used to find boundaries with array lookups."""
+    stop, leading, trailing, paragraph, newline_end, newline_start, char_start = ([] for _ in range(7))
+    for raw in token_bytes:
+        stop.append(raw.rstrip().rstrip(b"\"')]").endswith(_SENTENCE_STOPS))
+        leading.append(raw[:1].isspace())
+        trailing.append(raw[-1:].isspace())
+        paragraph.append(b"\n\n" in raw)
+        newline_end.append(raw.endswith(b"\n"))
+        newline_start.append(raw.startswith(b"\n"))
+        # Not a UTF-8 continuation byte (0b10xxxxxx)
+        char_start.append(not raw or raw[0] & 0xC0 != 0x80)
+    return [
+        np.array(flags, dtype=bool)
+        for flags in (stop, leading, trailing, paragraph, newline_end, newline_start, char_start)
+    ]
+
+
+class Chunker:
+    """Reusable token-level chunker; one instance serves every document."""
+
+    def __init__(self, chunk_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+        self.encoding = get_encoding()
+        if self.encoding is None:
+            token_bytes = [bytes([value]) for value in range(256)]
+            self.chunk_tokens, self.overlap_tokens = chunk_tokens * 4, overlap_tokens * 4
+        else:
+            token_bytes = []
+            for token in range(self.encoding.max_token_value + 1):
+                try:
+                    token_bytes.append(self.encoding.decode_single_token_bytes(token))
+                except KeyError:  # unused IDs between regular and special tokens
+                    token_bytes.append(b"")
+            self.chunk_tokens, self.overlap_tokens = chunk_tokens, overlap_tokens
+        (self._stop, self._leading, self._trailing, self._paragraph,
+         self._newline_end, self._newline_start, self._char_start) = _token_tables(token_bytes)
+
+    def count(self, texts):
+        """Token count of each text."""
+        if self.encoding is None:
+            return [len(text.encode("utf-8")) // 4 + 1 for text in texts]
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+    def _encode(self, pages):
+        if self.encoding is None:
+            return [np.frombuffer(page.encode("utf-8"), dtype=np.uint8) for page in pages]
+        if ENCODE_THREADS > 1:
+            encoded = self.encoding.encode_ordinary_batch(pages, num_threads=ENCODE_THREADS)
+        else:
+            encoded = [self.encoding.encode_ordinary(page) for page in pages]
+        return [np.array(tokens, dtype=np.int64) for tokens in encoded]
+
+    def _decode(self, tokens):
+        if self.encoding is None:
+            return tokens.tobytes().decode("utf-8", errors="ignore").strip()
+        return self.encoding.decode(tokens.tolist()).strip()
+
+    def _boundaries(self, tokens):
+        """Positions where a sentence ends, and where a paragraph ends."""
+        before, after = tokens[:-1], tokens[1:]
+        paragraph = self._paragraph[before] | (self._newline_end[before] & self._newline_start[after])
+        sentence = self._stop[before] & (self._trailing[before] | self._leading[after])
+        # Plain lists: bisect on them is much cheaper than numpy searchsorted per chunk
+        return (np.flatnonzero(sentence | paragraph) + 1).tolist(), (np.flatnonzero(paragraph) + 1).tolist()
+
+    def _cut(self, tokens, done, final):
+        """Yield chunk texts from ``tokens``; returns ``(start, done)``.
+
+        ``done`` is how far into ``tokens`` earlier chunks already reached.
+        Unless ``final``, stops while less than a chunk is left, since the
+        next pages may still continue it. The caller carries
+        ``tokens[start:]`` over.
+        """
+        sentences, paragraphs = self._boundaries(tokens)
+        start, size = 0, len(tokens)
+        while size > done and size - start > (0 if final else self.chunk_tokens):
+            limit = start + self.chunk_tokens
+            end = min(limit, size)
+            if limit < size:
+                low = start + int(self.chunk_tokens * MIN_FILL)
+                i = bisect_right(paragraphs, limit) - 1
+                j = bisect_right(sentences, limit) - 1
+                if i >= 0 and paragraphs[i] >= low:
+                    end = paragraphs[i]
+                elif j >= 0 and sentences[j] >= low:
+                    end = sentences[j]
+                else:
+                    # No boundary late enough: cut before the last word that
+                    # fits, else before the last whole character
+                    words = np.flatnonzero(self._leading[tokens[low + 1:limit + 1]])
+                    if not len(words):
+                        words = np.flatnonzero(self._char_start[tokens[start + 1:limit + 1]])
+                        low = start
+                    if len(words):
+                        end = low + 1 + int(words[-1])
+            yield self._decode(tokens[start:end])
+            done = end
+            # The next chunk starts at the first sentence inside the overlap
+            k = bisect_left(sentences, end - self.overlap_tokens)
+            start = sentences[k] if k < len(sentences) and start < sentences[k] < end else end
+        return start, done
+
+    def chunks(self, pages):
+        """Yield chunk texts for an iterable of page texts."""
+        carry = np.zeros(0, dtype=np.uint8 if self.encoding is None else np.int64)
+        carry_done = 0
+        batch = []
+
+        def flush(final):
+            nonlocal carry, carry_done
+            tokens = np.concatenate([carry, *self._encode([_unwrap(page) for page in batch])])
+            batch.clear()
+            start, done = yield from self._cut(tokens, carry_done, final)
+            carry, carry_done = tokens[start:], max(0, done - start)
+
+        for page in pages:
+            if page:
+                batch.append(page)
+            if len(batch) == BATCH_PAGES:
+                yield from flush(False)
+        yield from flush(True)
+
+
+_default_chunker = None
+
+
+def default_chunker():
+    """Process-wide Chunker built on first use."""
+    global _default_chunker
+    if _default_chunker is None:
+        _default_chunker = Chunker()
+    return _default_chunker
+
+
+def chunk_pages(pages):
+    """Chunk texts for an iterable of page texts with the default settings."""
+    return list(default_chunker().chunks(pages))
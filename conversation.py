@@ -0,0 +1,126 @@
+"""Conversation mode for the Query Assistant.
+
+Follow-up questions ("what about the second trend?") are rewritten into
+standalone questions before retrieval, and the answer prompt gets a short
+conversation history. To keep the per-turn token cost constant, the
+history sent with any request is capped at HISTORY_TOKEN_BUDGET tokens
+(counted with tiktoken): recent turns are kept verbatim and older ones are
+folded into a rolling summary of at most SUMMARY_TOKEN_BUDGET tokens.
+
+The conversation state is a plain dict kept in ``st.session_state``.
+"""
+
+import os
+from functools import lru_cache
+
+from rag_metrics import METRICS
+
+MODEL = "gpt-3.5-turbo"
+HISTORY_TOKEN_BUDGET = int(os.getenv("REPP_HISTORY_TOKENS", "600"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("REPP_SUMMARY_TOKENS", "200"))
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=MODEL):
+    """tiktoken encoding for ``model``, or None when it cannot be loaded."""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as err:  # missing package or no network for the BPE file
+        print(f"tiktoken unavailable ({err}); estimating tokens from characters")
+        return None
+
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        # Rule of thumb for English text with OpenAI tokenizers
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text, max_tokens):
+    """Keep at most ``max_tokens`` tokens from the start of ``text``."""
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def new_state(doc_hash):
+    return {"doc": doc_hash, "summary": "", "summary_tokens": 0, "turns": []}
+
+
+def _turn_text(turn):
+    return f"User: {turn['question']}\nAssistant: {turn['answer']}"
+
+
+def history_text(state, budget=HISTORY_TOKEN_BUDGET):
+    """Summary plus as many recent turns as fit in ``budget`` tokens."""
+    used = state["summary_tokens"]
+    recent = []
+    for turn in reversed(state["turns"]):
+        if used + turn["tokens"] > budget:
+            break
+        recent.append(turn)
+        used += turn["tokens"]
+    parts = []
+    if state["summary"]:
+        parts.append(f"Summary of the earlier conversation: {state['summary']}")
+    parts.extend(_turn_text(turn) for turn in reversed(recent))
+    return "\n".join(parts)
+
+
+def _complete(chat, prompt, stage):
+    with METRICS.stage(stage) as span:
+        response = chat(model=MODEL, messages=[{"role": "user", "content": prompt}], temperature=0)
+        span.items = 1
+        span.bytes = len(prompt.encode("utf-8"))
+        usage = response.get("usage") or {}
+        span.tokens = usage.get("total_tokens", 0)
+    return response.choices[0].message.content.strip()
+
+
+def condense_question(state, question, chat):
+    """Rewrite a follow-up into a standalone question for retrieval."""
+    if not state["summary"] and not state["turns"]:
+        return question
+    prompt = f"""
+    Rewrite the follow-up question so it can be understood without the conversation.
+    Keep names, numbers and document terms. Return only the rewritten question.
+    Conversation: {history_text(state)}
+    Follow-up question: {question}
+    Standalone question:
+    """
+    return _complete(chat, prompt, "condense") or question
+
+
+def record_turn(state, question, answer, chat):
+    """Add a finished turn and fold older turns into the rolling summary.
+
+    Folding happens only once the verbatim turns outgrow what is left of the
+    history budget after the summary, so it is an occasional extra call.
+    """
+    turn = {"question": question, "answer": truncate_tokens(answer, HISTORY_TOKEN_BUDGET // 2)}
+    turn["tokens"] = count_tokens(_turn_text(turn))
+    state["turns"].append(turn)
+
+    if sum(t["tokens"] for t in state["turns"]) <= HISTORY_TOKEN_BUDGET - SUMMARY_TOKEN_BUDGET:
+        return
+    to_fold, state["turns"] = state["turns"][:-1], state["turns"][-1:]
+    if not to_fold:
+        return
+    folded = truncate_tokens("\n".join(_turn_text(t) for t in to_fold), HISTORY_TOKEN_BUDGET)
+    prompt = f"""
+    Update the running summary of a conversation about a document with the new turns.
+    Keep the facts and topics a later follow-up question might refer to.
+    Current summary: {state['summary'] or '(none)'}
+    New turns: {folded}
+    Updated summary:
+    """
+    summary = truncate_tokens(_complete(chat, prompt, "summarize"), SUMMARY_TOKEN_BUDGET)
+    state["summary"] = summary
+    state["summary_tokens"] = count_tokens(summary)
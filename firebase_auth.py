@@ -0,0 +1,283 @@
+"""Firebase email/password authentication over the Identity Toolkit REST API.
+
+One FirebaseAuthClient is shared by every Streamlit session in the process.
+It keeps a pooled keep-alive HTTP session with timeouts, returns the full
+token pair on login and refreshes tokens in the background before they
+expire. Sessions are checked on rerun against the expiry of the tokens
+this client issued or refreshed, so reruns never call Firebase; only
+tokens from elsewhere go through verify(), whose results are cached.
+
+Set FIREBASE_AUTH_EMULATOR_HOST (e.g. ``localhost:9099``) to talk to the
+Firebase Auth emulator or any local mock server instead of Google.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+IDENTITY_URL = "https://identitytoolkit.googleapis.com/v1"
+SECURE_TOKEN_URL = "https://securetoken.googleapis.com/v1"
+
+# (connect, read) timeouts in seconds for every Firebase call
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# Refresh this many seconds before the ID token expires
+REFRESH_MARGIN = 300
+
+# Stop refreshing sessions nobody has touched for this long
+IDLE_TIMEOUT = 2 * 60 * 60
+
+# First retry delay after a refresh fails to reach Firebase; doubles per
+# failure, up to REFRESH_MARGIN
+REFRESH_RETRY_DELAY = 15
+
+# Verification results for tokens from elsewhere are reused for at most this long
+VERIFY_TTL = 300
+VERIFY_CACHE_SIZE = 1024
+
+
+class FirebaseAuthError(Exception):
+    """Raised when Firebase rejects a request; the message is Firebase's error code."""
+
+
+def _token_key(id_token):
+    return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+
+def _token_expiry(id_token):
+    """Read the ``exp`` claim of a JWT without checking its signature."""
+    try:
+        payload = id_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class AuthSession:
+    """Token pair of one logged-in user, refreshed in the background."""
+
+    def __init__(self, client, email, local_id, id_token, refresh_token, expires_in):
+        self.client = client
+        self.email = email
+        self.local_id = local_id
+        self._id_token = id_token
+        self._refresh_token = refresh_token
+        self._expires_at = time.time() + float(expires_in)
+        self._lock = threading.Lock()
+        self._timer = None
+        self._stopped = False
+        self._rejected = False
+        self._retries = 0
+        self.last_seen = time.time()
+
+    @property
+    def id_token(self):
+        with self._lock:
+            return self._id_token
+
+    @property
+    def expires_at(self):
+        with self._lock:
+            return self._expires_at
+
+    def is_expired(self):
+        return time.time() >= self.expires_at
+
+    def touch(self):
+        """Mark the session as in use so background refreshes keep going."""
+        self.last_seen = time.time()
+        with self._lock:
+            lapsed = self._timer is None and not self._stopped and not self._rejected
+        if lapsed and not self.is_expired():
+            self.start_auto_refresh()
+
+    def refresh(self):
+        """Exchange the refresh token for a new token pair now."""
+        with self._lock:
+            refresh_token = self._refresh_token
+        data = self.client.refresh_tokens(refresh_token)
+        with self._lock:
+            self._id_token = data["id_token"]
+            self._refresh_token = data["refresh_token"]
+            self._expires_at = time.time() + float(data["expires_in"])
+
+    def start_auto_refresh(self):
+        """Schedule a background refresh shortly before the ID token expires."""
+        with self._lock:
+            self._schedule(max(self._expires_at - time.time() - self.client.refresh_margin, 0))
+
+    def _schedule(self, delay):
+        # Called with the lock held
+        if self._stopped:
+            return
+        self._timer = threading.Timer(delay, self._refresh_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh_in_background(self):
+        if time.time() - self.last_seen > self.client.idle_timeout:
+            # Abandoned session: let the token lapse instead of refreshing
+            # forever; touch() restarts refreshing if the user comes back
+            with self._lock:
+                self._timer = None
+            return
+        try:
+            self.refresh()
+        except FirebaseAuthError as err:
+            # The refresh token was rejected (revoked, user disabled): stop
+            # refreshing and let the session end when the ID token expires
+            print(f"Token refresh rejected for '{self.email}': {err}")
+            with self._lock:
+                self._timer = None
+                self._rejected = True
+            return
+        except requests.RequestException as err:
+            # Firebase unreachable: retry with backoff, not on every rerun
+            with self._lock:
+                delay = min(REFRESH_RETRY_DELAY * 2 ** self._retries, self.client.refresh_margin)
+                self._retries += 1
+                self._schedule(delay)
+            print(f"Token refresh failed for '{self.email}', retrying in {delay}s: {err}")
+            return
+        with self._lock:
+            self._retries = 0
+        self.start_auto_refresh()
+
+    def stop(self):
+        """Cancel background refreshes (on logout)."""
+        with self._lock:
+            self._stopped = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class FirebaseAuthClient:
+    """Pooled, timeout-bound client for Firebase email/password auth."""
+
+    def __init__(self, api_key, emulator_host=None, timeout=DEFAULT_TIMEOUT,
+                 refresh_margin=REFRESH_MARGIN, idle_timeout=IDLE_TIMEOUT,
+                 verify_ttl=VERIFY_TTL, pool_size=16):
+        self.api_key = api_key
+        if emulator_host:
+            self.identity_url = f"http://{emulator_host}/identitytoolkit.googleapis.com/v1"
+            self.secure_token_url = f"http://{emulator_host}/securetoken.googleapis.com/v1"
+        else:
+            self.identity_url = IDENTITY_URL
+            self.secure_token_url = SECURE_TOKEN_URL
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self.verify_ttl = verify_ttl
+
+        # Keep-alive connection pool; only connection failures are retried
+        # because sign-up is not idempotent
+        self.http = requests.Session()
+        retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+
+        self._verify_cache = OrderedDict()
+        self._verify_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("FIREBASE_API_KEY"), emulator_host=os.getenv("FIREBASE_AUTH_EMULATOR_HOST"))
+
+    def _post(self, url, **kwargs):
+        response = self.http.post(url, params={"key": self.api_key}, timeout=self.timeout, **kwargs)
+        if response.status_code != 200:
+            try:
+                message = response.json().get("error", {}).get("message", "An error occurred")
+            except ValueError:
+                message = f"HTTP {response.status_code}"
+            raise FirebaseAuthError(message)
+        return response.json()
+
+    def _start_session(self, data):
+        session = AuthSession(
+            self, data.get("email"), data.get("localId"),
+            data["idToken"], data["refreshToken"], data.get("expiresIn", 3600)
+        )
+        # Firebase just issued this token, so it is valid until it expires
+        self._remember(session.id_token, {"localId": session.local_id, "email": session.email}, session.expires_at)
+        return session
+
+    def sign_in(self, email, password):
+        """Log in with email and password; returns an AuthSession."""
+        payload = {"email": email, "password": password, "returnSecureToken": True}
+        return self._start_session(self._post(f"{self.identity_url}/accounts:signInWithPassword", json=payload))
+
+    def sign_up(self, email, password):
+        """Create an account; returns an AuthSession for the new user."""
+        payload = {"email": email, "password": password, "returnSecureToken": True}
+        return self._start_session(self._post(f"{self.identity_url}/accounts:signUp", json=payload))
+
+    def refresh_tokens(self, refresh_token):
+        """Exchange a refresh token; returns the raw secure token response."""
+        data = self._post(
+            f"{self.secure_token_url}/token",
+            data={"grant_type": "refresh_token", "refresh_token": refresh_token}
+        )
+        self._remember(data["id_token"], {"localId": data.get("user_id")},
+                       time.time() + float(data["expires_in"]))
+        return data
+
+    def _remember(self, id_token, user, valid_until):
+        with self._verify_lock:
+            self._verify_cache[_token_key(id_token)] = (valid_until, user)
+            self._verify_cache.move_to_end(_token_key(id_token))
+            while len(self._verify_cache) > VERIFY_CACHE_SIZE:
+                self._verify_cache.popitem(last=False)
+
+    def verify(self, id_token):
+        """Return the user record for a valid ID token, using the cache when possible.
+
+        Raises FirebaseAuthError when Firebase rejects the token.
+        """
+        key = _token_key(id_token)
+        now = time.time()
+        with self._verify_lock:
+            cached = self._verify_cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._verify_cache.move_to_end(key)
+                return cached[1]
+
+        data = self._post(f"{self.identity_url}/accounts:lookup", json={"idToken": id_token})
+        users = data.get("users") or []
+        if not users:
+            raise FirebaseAuthError("INVALID_ID_TOKEN")
+        expires_at = _token_expiry(id_token) or now + self.verify_ttl
+        # Not issued by this client, so it may be revoked; look it up again soon
+        self._remember(id_token, users[0], min(now + self.verify_ttl, expires_at))
+        return users[0]
+
+    def is_session_valid(self, session):
+        """Check a session on rerun without a network call.
+
+        Tokens this client issued or refreshed are trusted until they
+        expire. Other sessions are verified; an unreachable identity
+        endpoint does not log the user out.
+        """
+        session.touch()
+        if session.is_expired():
+            return False
+        if session.client is self:
+            return True
+        try:
+            self.verify(session.id_token)
+        except FirebaseAuthError:
+            return False
+        except requests.RequestException as err:
+            print(f"Could not verify the session of '{session.email}', keeping it: {err}")
+        return True
@@ -0,0 +1,422 @@
+"""Headless multi-user load test for the REPP Streamlit app.
+
+Starts ``streamlit run mainapp.py`` with local stand-ins (a mock Firebase
+identity server and the offline embedding/chat fakes from rag_fakes.py),
+then drives N concurrent simulated browser sessions over Streamlit's
+websocket protocol: login, page navigation, PDF upload and "Ask" clicks.
+For every concurrency level it reports throughput, rerun latency per
+action and server memory per session as JSON.
+
+Per-user rate limits (admission.py) are switched off unless --rate-limits
+is given, so the numbers measure the work rather than rejections. Reruns
+that end in an admission warning are counted as rejected and timed under
+``<action>_rejected``, never as the action itself.
+
+MySQL is not needed: none of the driven pages write to the database.
+
+Usage:
+    python loadtest.py
+    python loadtest.py --sessions 1 10 25 50 --asks 5 --chat-latency 0.5 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from tornado.websocket import websocket_connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Common_pb2 import FileURLsRequest, FileUploaderState, UploadedFileInfo
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from bench_rag import write_pdf
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOADTEST_PASSWORD = "loadtest-password"
+
+# Element types whose values the simulated browser keeps track of
+WIDGET_TYPES = {"button", "text_input", "text_area", "radio", "selectbox", "file_uploader",
+                "checkbox", "slider", "color_picker", "download_button"}
+
+RUN_DONE = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR}
+
+# mainapp.py shows admission.AdmissionError messages as warnings with this icon
+ADMISSION_WARNING = "⏳"
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MockFirebase:
+    """Local stand-in for the Identity Toolkit and secure token endpoints."""
+
+    def __init__(self):
+        handler = self._handler()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.host = f"127.0.0.1:{self.server.server_port}"
+
+    @staticmethod
+    def _handler():
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, data = 200, {}
+                if "accounts:signInWithPassword" in self.path or "accounts:signUp" in self.path:
+                    payload = json.loads(body or b"{}")
+                    if payload.get("password") != LOADTEST_PASSWORD:
+                        status, data = 400, {"error": {"message": "INVALID_PASSWORD"}}
+                    else:
+                        data = {"email": payload["email"], "localId": payload["email"],
+                                "idToken": "mock-id-token." + payload["email"],
+                                "refreshToken": "mock-refresh-token", "expiresIn": "3600"}
+                elif self.path.startswith("/securetoken.googleapis.com"):
+                    data = {"id_token": "mock-id-token", "refresh_token": "mock-refresh-token",
+                            "expires_in": "3600", "user_id": "loadtest"}
+                elif "accounts:lookup" in self.path:
+                    data = {"users": [{"localId": "loadtest"}]}
+                else:
+                    status, data = 404, {"error": {"message": "NOT_FOUND"}}
+                out = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class AppServer:
+    """``streamlit run mainapp.py`` in a subprocess wired to the stand-ins."""
+
+    def __init__(self, port, firebase_host, embed_latency, chat_latency, rate_limits=False):
+        self.port = port
+        self.env = dict(
+            os.environ,
+            FIREBASE_API_KEY="loadtest",
+            FIREBASE_AUTH_EMULATOR_HOST=firebase_host,
+            REPP_OFFLINE_BACKENDS="1",
+            REPP_FAKE_EMBED_LATENCY=str(embed_latency),
+            REPP_FAKE_CHAT_LATENCY=str(chat_latency),
+        )
+        if not rate_limits:
+            self.env.update(REPP_QUERY_RATE="0", REPP_INGEST_RATE="0")
+        self.proc = None
+
+    def start(self, timeout=120):
+        cmd = [
+            sys.executable, "-m", "streamlit", "run", "mainapp.py",
+            "--server.headless", "true", "--server.port", str(self.port),
+            "--server.address", "127.0.0.1", "--server.enableXsrfProtection", "false",
+            "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+        ]
+        self.proc = subprocess.Popen(cmd, cwd=APP_DIR, env=self.env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if requests.get(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        raise RuntimeError("Streamlit server did not become healthy")
+
+    def rss_mb(self):
+        """Resident memory of the server process (Linux /proc)."""
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        if self.proc is not None:
+            self.proc.terminate()
+            self.proc.wait(timeout=30)
+
+
+class SimSession:
+    """One simulated browser tab speaking Streamlit's websocket protocol."""
+
+    def __init__(self, port, timings):
+        self.port = port
+        self.timings = timings
+        self.ws = None
+        self.session_id = None
+        self.widgets = {}
+        self.states = {}
+        self.msg_cache = {}
+        self.errors = 0
+        self.rejected = 0
+        self._rejected_run = False
+        self.pending_urls = {}
+
+    async def connect(self):
+        self.ws = await websocket_connect(f"ws://127.0.0.1:{self.port}/_stcore/stream",
+                                          subprotocols=["streamlit"], max_message_size=64 * 1024 * 1024)
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    async def _send(self, back_msg):
+        await self.ws.write_message(back_msg.SerializeToString(), binary=True)
+
+    async def _receive(self):
+        raw = await self.ws.read_message()
+        if raw is None:
+            raise ConnectionError("websocket closed by server")
+        msg = ForwardMsg()
+        msg.ParseFromString(raw)
+        if msg.HasField("ref_hash"):
+            msg = self.msg_cache[msg.ref_hash]
+        elif msg.hash:
+            self.msg_cache[msg.hash] = msg
+        return msg
+
+    def _record_element(self, msg):
+        if msg.WhichOneof("type") != "delta" or msg.delta.WhichOneof("type") != "new_element":
+            return
+        element = msg.delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.errors += 1
+        elif kind == "alert" and element.alert.body.startswith(ADMISSION_WARNING):
+            self._rejected_run = True
+        if kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            self.widgets[(kind, widget.label)] = widget
+
+    async def rerun(self, action, trigger=None):
+        """Rerun the script with the current widget states; records latency."""
+        states = [state for state in self.states.values()]
+        if trigger is not None:
+            states.append(WidgetState(id=self.widgets[("button", trigger)].id, trigger_value=True))
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ""
+        back_msg.rerun_script.page_script_hash = ""
+        back_msg.rerun_script.widget_states.widgets.extend(states)
+
+        self.widgets = {}
+        self._rejected_run = False
+        start = time.perf_counter()
+        await self._send(back_msg)
+        while True:
+            msg = await self._receive()
+            kind = msg.WhichOneof("type")
+            if kind == "new_session" and msg.new_session.initialize.session_id:
+                self.session_id = msg.new_session.initialize.session_id
+            elif kind == "file_urls_response":
+                self.pending_urls[msg.file_urls_response.response_id] = msg.file_urls_response
+            elif kind == "script_finished" and msg.script_finished in RUN_DONE:
+                break
+            self._record_element(msg)
+        if self._rejected_run:
+            self.rejected += 1
+            action = f"{action}_rejected"
+        self.timings.setdefault(action, []).append(time.perf_counter() - start)
+
+    def set_text(self, kind, label, value):
+        widget_id = self.widgets[(kind, label)].id
+        self.states[widget_id] = WidgetState(id=widget_id, string_value=value)
+
+    def set_radio(self, label, option):
+        widget = self.widgets[("radio", label)]
+        self.states[widget.id] = WidgetState(id=widget.id, int_value=list(widget.options).index(option))
+
+    async def upload(self, label, file_name, data):
+        """Upload a file through the server's upload endpoint and select it."""
+        request_id = f"upload-{len(self.pending_urls)}"
+        back_msg = BackMsg()
+        back_msg.file_urls_request.CopyFrom(
+            FileURLsRequest(request_id=request_id, file_names=[file_name], session_id=self.session_id)
+        )
+        await self._send(back_msg)
+        while request_id not in self.pending_urls:
+            msg = await self._receive()
+            if msg.WhichOneof("type") == "file_urls_response":
+                self.pending_urls[msg.file_urls_response.response_id] = msg.file_urls_response
+        file_urls = self.pending_urls[request_id].file_urls[0]
+
+        url = f"http://127.0.0.1:{self.port}{file_urls.upload_url}"
+        response = await asyncio.to_thread(
+            requests.put, url, files={"file": (file_name, data, "application/pdf")}, timeout=60
+        )
+        response.raise_for_status()
+
+        widget_id = self.widgets[("file_uploader", label)].id
+        info = UploadedFileInfo(file_id=file_urls.file_id, name=file_name, size=len(data), file_urls=file_urls)
+        self.states[widget_id] = WidgetState(
+            id=widget_id, file_uploader_state_value=FileUploaderState(max_file_id=0, uploaded_file_info=[info])
+        )
+
+
+async def run_scenario(session, user, pdf_bytes, asks, think_time=0.0):
+    """Login, navigate Home -> Query Assistant, upload a PDF and ask questions.
+
+    ``think_time`` is how long the user spends on the login form, which is
+    when server-start work such as warmup.py runs.
+    """
+    await session.connect()
+    await session.rerun("initial_load")
+    await asyncio.sleep(think_time)
+
+    session.set_text("text_input", "Email Address", f"{user}@loadtest.local")
+    session.set_text("text_input", "Password", LOADTEST_PASSWORD)
+    await session.rerun("login", trigger="Login")
+    await session.rerun("first_app_render")
+
+    session.set_radio("Go to", "Home")
+    await session.rerun("navigate_home")
+    session.set_radio("Go to", "Query Assistant")
+    await session.rerun("navigate_query_assistant")
+
+    await session.upload("Upload a PDF for Chatbot", "report.pdf", pdf_bytes)
+    await session.rerun("pdf_upload")
+
+    for ask in range(asks):
+        session.set_text("text_input", "Ask your question about the uploaded document",
+                         f"What are the key findings about topic {ask}?")
+        await session.rerun("ask", trigger="Ask")
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 1),
+        "p50_ms": round(pick(0.50) * 1000, 1),
+        "p95_ms": round(pick(0.95) * 1000, 1),
+        "p99_ms": round(pick(0.99) * 1000, 1),
+    }
+
+
+async def run_level(server, sessions, pdf_bytes, asks, think_time=0.0):
+    """Run ``sessions`` concurrent scenarios and summarize them."""
+    rss_before = server.rss_mb()
+    timings = {}
+    clients = [SimSession(server.port, timings) for _ in range(sessions)]
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(
+        # Fresh users per level, so rate limit buckets never carry over
+        *(run_scenario(client, f"user{sessions}-{i}", pdf_bytes, asks, think_time)
+          for i, client in enumerate(clients)),
+        return_exceptions=True
+    )
+    elapsed = time.perf_counter() - start
+    # Measure while every session is still connected and holding its state
+    rss_after = server.rss_mb()
+    for client in clients:
+        client.close()
+
+    failures = [repr(outcome) for outcome in outcomes if isinstance(outcome, BaseException)]
+    reruns = sum(len(samples) for samples in timings.values())
+    all_samples = [sample for samples in timings.values() for sample in samples]
+    return {
+        "sessions": sessions,
+        "wall_s": round(elapsed, 2),
+        "reruns": reruns,
+        "throughput_reruns_per_s": round(reruns / elapsed, 2) if elapsed else None,
+        "rerun_latency": _summary(all_samples) if all_samples else None,
+        "by_action": {action: _summary(samples) for action, samples in timings.items()},
+        "failed_sessions": len(failures),
+        "failures": failures[:5],
+        "script_exceptions": sum(client.errors for client in clients),
+        "rejected_actions": sum(client.rejected for client in clients),
+        "server_rss_mb": {"before": rss_before, "after": rss_after},
+        "rss_per_session_mb": round((rss_after - rss_before) / sessions, 2)
+        if rss_after is not None and rss_before is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-user load test for the REPP Streamlit app.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25],
+                        help="concurrency levels to run, in order")
+    parser.add_argument("--asks", type=int, default=3, help="Ask clicks per session")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="pages in the uploaded PDF")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per fake embedding request")
+    parser.add_argument("--chat-latency", type=float, default=0.5, help="seconds per fake chat completion")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds each user spends on the login form")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="keep the app's per-user rate limits on (off by default)")
+    parser.add_argument("--port", type=int, help="port for the Streamlit server (default: a free port)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "report.pdf")
+        write_pdf(pdf_path, args.pdf_pages)
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+
+    firebase = MockFirebase()
+    firebase.start()
+    server = AppServer(args.port or _free_port(), firebase.host, args.embed_latency, args.chat_latency,
+                       rate_limits=args.rate_limits)
+    server.start()
+    levels = []
+    try:
+        for sessions in args.sessions:
+            levels.append(asyncio.run(run_level(server, sessions, pdf_bytes, args.asks, args.think_time)))
+            print(f"{sessions} session(s) done", file=sys.stderr)
+    finally:
+        server.stop()
+        firebase.stop()
+
+    report = {
+        "benchmark": "streamlit_load",
+        "config": {
+            "asks_per_session": args.asks,
+            "pdf_pages": args.pdf_pages,
+            "embed_latency_s": args.embed_latency,
+            "chat_latency_s": args.chat_latency,
+            "think_time_s": args.think_time,
+            "rate_limits": args.rate_limits,
+        },
+        "levels": levels,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
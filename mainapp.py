@@ -1,19 +1,30 @@
 
 import streamlit as st
 import os
+import hashlib
+import json
+import uuid
 from dotenv import load_dotenv
-from langchain_community.vectorstores import FAISS
-from langchain.embeddings import OpenAIEmbeddings
-import openai
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 import requests  # For making REST API calls
-import mysql.connector
 
-# Load the .env file
+# Load the .env file before the local modules below read their DB_* and
+# REPP_* settings at import time
 load_dotenv()
 
+from firebase_auth import FirebaseAuthClient, FirebaseAuthError
+from rag_metrics import METRICS, start_file_dumper, start_http_server
+import admission
+import analytics
+from artifact_catalog import SECTIONS, ArtifactCatalog
+import chat_history
+import warmup
+
+# The RAG stack (LangChain, FAISS, OpenAI, PyPDF2) lives in rag_pipeline.py and
+# mysql.connector is imported in get_db_connection(); both are loaded lazily so
+# the login page renders without paying for them. See startup_report.py.
+
 def get_db_connection():
+    import mysql.connector
     return mysql.connector.connect(
         host=os.getenv("DB_HOST"),           # Host from .env
         user=os.getenv("DB_USER"),           # Username from .env
@@ -23,6 +34,7 @@ def get_db_connection():
 
 def save_upload_to_db(username, file_name):
     """Save the username and file name to the uploads table in the MySQL database."""
+    import mysql.connector
     try:
         connection = get_db_connection()
         cursor = connection.cursor()
@@ -45,17 +57,100 @@ def save_upload_to_db(username, file_name):
 
 
 
-# Load the .env file
-load_dotenv()
+# Characters of each source chunk shown under a Query Assistant answer
+SOURCE_SNIPPET_CHARS = 400
+
+# Users allowed to see the RAG metrics panel (comma separated emails)
+ADMIN_EMAILS = {email.strip() for email in os.getenv("REPP_ADMIN_EMAILS", "").split(",") if email.strip()}
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
+# Expose RAG stage metrics once per server process, if configured
+@st.cache_resource
+def start_metrics_exporters():
+    if os.getenv("REPP_METRICS_PORT"):
+        start_http_server(int(os.getenv("REPP_METRICS_PORT")))
+    if os.getenv("REPP_METRICS_FILE"):
+        start_file_dumper(os.getenv("REPP_METRICS_FILE"))
+    return True
 
+# Preload indexes and the tokenizer in the background, once per server
+# process, so the first Query Assistant user does not pay the cold start
+@st.cache_resource
+def start_warmup():
+    return warmup.start()
 
+# One pooled Firebase client shared by every session on this server
+@st.cache_resource
+def get_auth_client():
+    return FirebaseAuthClient.from_env()
 
-# Firebase REST API endpoints
-FIREBASE_SIGNUP_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signUp?key={FIREBASE_API_KEY}"
-FIREBASE_LOGIN_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={FIREBASE_API_KEY}"
+# Uploaded dashboards, datasets, presentations and images are stored and
+# cataloged on disk, shared by every session on this server
+@st.cache_resource
+def get_artifact_catalog():
+    return ArtifactCatalog()
+
+def artifact_owner():
+    return st.session_state.get("user_email") or "anonymous"
+
+def catalog_uploads(section, uploaded_files):
+    """Add new uploads to the artifact catalog; returns how many were new.
+
+    st.file_uploader returns the same files on every rerun, so each file is
+    hashed and stored only the first time this session sees it.
+    """
+    seen = st.session_state.setdefault("cataloged_uploads", set())
+    added = 0
+    for uploaded_file in uploaded_files:
+        if uploaded_file.file_id in seen:
+            continue
+        get_artifact_catalog().add(artifact_owner(), section, uploaded_file)
+        seen.add(uploaded_file.file_id)
+        added += 1
+    return added
+
+def _go_to_page(cursors, after):
+    if after is None:
+        cursors.pop()
+    else:
+        cursors.append(after)
+
+def artifact_page(section, label, filters=True):
+    """One page of a section's artifacts from the catalog, with paging controls.
+
+    The catalog pages on its index, so this costs the same however many
+    files were uploaded; file contents are not read here.
+    """
+    catalog = get_artifact_catalog()
+    owner = artifact_owner()
+    # Cursor of every page up to the current one, for Previous
+    cursors = st.session_state.setdefault(f"{section}_cursors", [None])
+    type_filter, name_filter = "All", ""
+    if filters:
+        type_column, name_column = st.columns(2)
+        type_filter = type_column.selectbox(
+            f"{label} type", ["All"] + catalog.types(owner, section), key=f"{section}_type_filter"
+        )
+        name_filter = name_column.text_input(f"Search {label.lower()} by name", key=f"{section}_name_filter")
+    if st.session_state.get(f"{section}_filters") != (type_filter, name_filter):
+        st.session_state[f"{section}_filters"] = (type_filter, name_filter)
+        cursors[:] = [None]
+    artifacts, next_after = catalog.page(
+        owner, section, after=cursors[-1],
+        type=None if type_filter == "All" else type_filter,
+        name_contains=name_filter
+    )
+    if len(cursors) > 1 or next_after is not None:
+        previous_column, page_column, next_column = st.columns([1, 2, 1])
+        previous_column.button(
+            "Previous", key=f"{section}_previous", disabled=len(cursors) == 1,
+            on_click=_go_to_page, args=(cursors, None)
+        )
+        page_column.caption(f"Page {len(cursors)}")
+        next_column.button(
+            "Next", key=f"{section}_next", disabled=next_after is None,
+            on_click=_go_to_page, args=(cursors, next_after)
+        )
+    return artifacts
 
 # Page configuration
 st.set_page_config(
@@ -64,6 +159,9 @@ st.set_page_config(
     layout="wide"
 )
 
+start_metrics_exporters()
+start_warmup()
+
 
 # Custom CSS for animations and styling
 st.markdown(
@@ -207,19 +305,19 @@ def login_page():
         if st.button('Login'):
             if email and password:
                 # Call Firebase REST API for Login
-                payload = {
-                    "email": email,
-                    "password": password,
-                    "returnSecureToken": True
-                }
-                response = requests.post(FIREBASE_LOGIN_URL, json=payload)
-                if response.status_code == 200:
-                    data = response.json()
-                    st.success(f"Welcome back, {data['email']}!")
-                    st.session_state['logged_in'] = True
+                try:
+                    auth_session = get_auth_client().sign_in(email, password)
+                except FirebaseAuthError as err:
+                    st.error(f"Login failed: {err}")
+                except requests.RequestException:
+                    st.error("Login failed: could not reach the authentication service.")
                 else:
-                    error_message = response.json().get("error", {}).get("message", "An error occurred")
-                    st.error(f"Login failed: {error_message}")
+                    # Keep the token pair so reruns can be checked without calling Firebase
+                    auth_session.start_auto_refresh()
+                    st.session_state['auth_session'] = auth_session
+                    st.session_state['user_email'] = auth_session.email
+                    st.success(f"Welcome back, {auth_session.email}!")
+                    st.session_state['logged_in'] = True
             else:
                 st.error("Please enter both email and password.")
 
@@ -239,18 +337,15 @@ def login_page():
                 st.error("Passwords do not match!")
             elif email and password:
                 # Call Firebase REST API for Signup
-                payload = {
-                    "email": email,
-                    "password": password,
-                    "returnSecureToken": True
-                }
-                response = requests.post(FIREBASE_SIGNUP_URL, json=payload)
-                if response.status_code == 200:
+                try:
+                    get_auth_client().sign_up(email, password)
+                except FirebaseAuthError as err:
+                    st.error(f"Signup failed: {err}")
+                except requests.RequestException:
+                    st.error("Signup failed: could not reach the authentication service.")
+                else:
                     st.success("Signup successful! Please login using your credentials.")
                     st.balloons()
-                else:
-                    error_message = response.json().get("error", {}).get("message", "An error occurred")
-                    st.error(f"Signup failed: {error_message}")
             else:
                 st.error("Please fill in all fields.")
 
@@ -258,6 +353,13 @@ def login_page():
 if 'logged_in' not in st.session_state:
     st.session_state['logged_in'] = False
 
+# Reruns check the stored session against its token expiry, so they never
+# hit the identity endpoint
+if st.session_state['logged_in'] and 'auth_session' in st.session_state:
+    if not get_auth_client().is_session_valid(st.session_state['auth_session']):
+        st.session_state.pop('auth_session').stop()
+        st.session_state['logged_in'] = False
+
 # Show login page if not logged in
 if not st.session_state['logged_in']:
     login_page()
@@ -402,12 +504,34 @@ st.sidebar.radio(
 # Add a Logout Button to the Sidebar
 if st.session_state.get("logged_in", False):
     if st.sidebar.button("Logout", key="logout_button", help="Click to logout"):
-        # Reset the login state
+        # Reset the login state and stop background token refreshes
         st.session_state["logged_in"] = False
+        if "auth_session" in st.session_state:
+            st.session_state.pop("auth_session").stop()
         st.session_state["current_page"] = "Home"  # Redirect to Home or Login
         st.success("You have been logged out.")
         st.stop()
 
+# Admin panel with per-stage RAG latency and volume
+if st.session_state.get("user_email") in ADMIN_EMAILS:
+    with st.sidebar.expander("RAG Metrics (admin)"):
+        metrics_rows = METRICS.snapshot()
+        if metrics_rows:
+            st.dataframe(metrics_rows, hide_index=True)
+        else:
+            st.write("No RAG activity recorded yet.")
+        st.caption("Job queues")
+        st.dataframe(admission.stats(), hide_index=True)
+        if analytics.SINK.enabled:
+            st.caption("Analytics events: " + ", ".join(f"{key} {value}" for key, value in analytics.SINK.stats().items()))
+        st.download_button(
+            label="Download Prometheus metrics",
+            data=METRICS.render_prometheus(),
+            file_name="repp_metrics.prom",
+            mime="text/plain",
+            key="download_metrics"
+        )
+
 # Synchronize the `page` variable with the session state
 page = st.session_state["current_page"]
 
@@ -438,6 +562,13 @@ if "current_page" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state["chat_history"] = []
 
+# Older chat messages are spilled to a per-session log on disk
+if "chat_log_id" not in st.session_state:
+    # Logs of sessions that ended long ago are deleted as new ones start
+    chat_history.prune_logs()
+    st.session_state["chat_log_id"] = uuid.uuid4().hex
+    st.session_state["chat_spilled"] = 0
+
 if 'project_data' not in st.session_state:
     st.session_state['project_data'] = {
         "name": "",
@@ -481,6 +612,46 @@ if 'project_data' not in st.session_state:
     }
 
 
+# Home page sections that can be customized on the REPP page, in display order
+HOME_SECTIONS = ["custom_text_name", "custom_text_team", "custom_text_supervisor", "custom_text_details"]
+CUSTOM_TEXT_FIELDS = ["content", "font_size", "color", "font", "is_bold", "is_italic"]
+HOME_SECTION_TITLES = {
+    "custom_text_team": "Team Members",
+    "custom_text_supervisor": "Supervisor",
+    "custom_text_details": "Project Details",
+}
+
+def home_render_key(project_data):
+    """Hash of the Home page customization state, used as the render cache key."""
+    state = {section: project_data[section] for section in HOME_SECTIONS}
+    return hashlib.sha1(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def render_home_fragment(render_key, _project_data):
+    """Build the Home page HTML once per customization state.
+
+    Only ``render_key`` is hashed by Streamlit; the project data is passed
+    along untouched so unrelated reruns never walk the section dicts.
+    """
+    rules = []
+    blocks = []
+    for section in HOME_SECTIONS:
+        custom = _project_data[section]
+        css_class = section.replace("custom_text_", "home-")
+        rules.append(
+            f".{css_class} {{ font-size:{custom['font_size']}px; color:{custom['color']}; "
+            f"font-weight:{'bold' if custom['is_bold'] else 'normal'}; "
+            f"font-style:{'italic' if custom['is_italic'] else 'normal'}; "
+            f"font-family:{custom.get('font', 'Arial')}; }}"
+        )
+        if section == "custom_text_name":
+            blocks.append(f'<h1 class="{css_class}" style="text-align:center;">{custom["content"]}</h1>')
+        else:
+            blocks.append(f"<h3>{HOME_SECTION_TITLES[section]}</h3>")
+            blocks.append(f'<div class="{css_class}">{custom["content"]}</div>')
+    return "<style>\n" + "\n".join(rules) + "\n</style>\n" + "\n".join(blocks)
+
+
 # Input Page: Add customization options for each section
 if page == "REPP":
     st.title("Welcome to the customization page of the RAG Enhanced Presentation Platform (REPP)")
@@ -635,38 +806,17 @@ if page == "REPP":
 
     # Save Changes Button
     if st.button("Save Changes"):
-        st.session_state['project_data']["custom_text_name"].update({
-            "content": st.session_state.custom_text_name_content,
-            "font_size": st.session_state.custom_text_name_font_size,
-            "color": st.session_state.custom_text_name_color,
-            "font": st.session_state.custom_text_name_font,
-            "is_bold": st.session_state.custom_text_name_is_bold,
-            "is_italic": st.session_state.custom_text_name_is_italic,
-        })
-        st.session_state['project_data']["custom_text_team"].update({
-            "content": st.session_state.custom_text_team_content,
-            "font_size": st.session_state.custom_text_team_font_size,
-            "color": st.session_state.custom_text_team_color,
-            "font": st.session_state.custom_text_team_font,
-            "is_bold": st.session_state.custom_text_team_is_bold,
-            "is_italic": st.session_state.custom_text_team_is_italic,
-        })
-        st.session_state['project_data']["custom_text_supervisor"].update({
-            "content": st.session_state.custom_text_supervisor_content,
-            "font_size": st.session_state.custom_text_supervisor_font_size,
-            "color": st.session_state.custom_text_supervisor_color,
-            "font": st.session_state.custom_text_supervisor_font,
-            "is_bold": st.session_state.custom_text_supervisor_is_bold,
-            "is_italic": st.session_state.custom_text_supervisor_is_italic,
-        })
-        st.session_state['project_data']["custom_text_details"].update({
-            "content": st.session_state.custom_text_details_content,
-            "font_size": st.session_state.custom_text_details_font_size,
-            "color": st.session_state.custom_text_details_color,
-            "font": st.session_state.custom_text_details_font,
-            "is_bold": st.session_state.custom_text_details_is_bold,
-            "is_italic": st.session_state.custom_text_details_is_italic,
-        })
+        # Only touch the sections whose fields actually changed so the cached
+        # Home page fragment stays valid for everything else
+        changed = False
+        for section in HOME_SECTIONS:
+            new_values = {field: st.session_state[f"{section}_{field}"] for field in CUSTOM_TEXT_FIELDS}
+            current = st.session_state['project_data'][section]
+            if any(current.get(field) != value for field, value in new_values.items()):
+                current.update(new_values)
+                changed = True
+        if changed:
+            st.session_state["home_render_key"] = home_render_key(st.session_state['project_data'])
 
         st.success("Changes saved successfully!")
 
@@ -680,10 +830,9 @@ if page == "REPP":
             key="dashboard_upload"
         )
     if uploaded_dashboards:
-        if "dashboards" not in st.session_state['project_data']:
-                st.session_state['project_data']["dashboards"] = []
-        st.session_state['project_data']["dashboards"].extend(uploaded_dashboards)
-        st.success(f"{len(uploaded_dashboards)} dashboard(s) uploaded successfully!")
+        added = catalog_uploads("dashboards", uploaded_dashboards)
+        if added:
+            st.success(f"{added} dashboard(s) uploaded successfully!")
 
         # Datasets Upload Section
     st.subheader("Upload Datasets")
@@ -694,10 +843,9 @@ if page == "REPP":
             key="dataset_upload"
         )
     if uploaded_datasets:
-        if "datasets" not in st.session_state['project_data']:
-            st.session_state['project_data']["datasets"] = []
-        st.session_state['project_data']["datasets"].extend(uploaded_datasets)
-        st.success(f"{len(uploaded_datasets)} dataset(s) uploaded successfully!")
+        added = catalog_uploads("datasets", uploaded_datasets)
+        if added:
+            st.success(f"{added} dataset(s) uploaded successfully!")
 
         # Presentation Upload Section
     st.subheader("Upload Presentation")
@@ -708,10 +856,9 @@ if page == "REPP":
             key="presentation_upload"
         )
     if uploaded_presentations:
-        if "presentations" not in st.session_state['project_data']:
-            st.session_state['project_data']["presentations"] = []
-        st.session_state['project_data']["presentations"].extend(uploaded_presentations)
-        st.success(f"{len(uploaded_presentations)} presentation(s) uploaded successfully!")
+        added = catalog_uploads("presentations", uploaded_presentations)
+        if added:
+            st.success(f"{added} presentation(s) uploaded successfully!")
 
         # Google Slides Link
     st.subheader("Embed Google Slides")
@@ -733,10 +880,41 @@ if page == "REPP":
             key="image_upload"
         )
     if uploaded_images:
-        if "images" not in st.session_state['project_data']:
-                st.session_state['project_data']["images"] = []
-        st.session_state['project_data']["images"].extend(uploaded_images)
-        st.success(f"{len(uploaded_images)} image(s) uploaded successfully!")
+        added = catalog_uploads("images", uploaded_images)
+        if added:
+            st.success(f"{added} image(s) uploaded successfully!")
+
+        # Static Site Export Section
+    st.subheader("Export Static Site")
+    st.markdown("Snapshot the Home, Dashboards and Datasets, and Presentation pages into a static site that any web server or CDN can host for viewers.")
+    if st.button("Export Static Site"):
+        from static_export import export_static_site, zip_site
+        if "home_render_key" not in st.session_state:
+            st.session_state["home_render_key"] = home_render_key(st.session_state['project_data'])
+        if "export_id" not in st.session_state:
+            st.session_state["export_id"] = uuid.uuid4().hex[:12]
+        export_dir = os.path.join(os.getenv("REPP_EXPORT_DIR", "site_export"), st.session_state["export_id"])
+        # The export includes everything in the catalog, not just this session's uploads
+        catalog = get_artifact_catalog()
+        export_data = dict(st.session_state['project_data'])
+        export_data.update({section: catalog.all(artifact_owner(), section) for section in SECTIONS})
+        with st.spinner("Exporting static site..."):
+            manifest = export_static_site(
+                export_data,
+                render_home_fragment(st.session_state["home_render_key"], st.session_state['project_data']),
+                export_dir
+            )
+            # Only the path is kept in the session; the zip stays on disk
+            st.session_state["static_site_zip"] = zip_site(export_dir, f"{export_dir}.zip")
+        st.success(f"Static site exported to '{export_dir}' ({len(manifest['assets'])} asset file(s)).")
+    if os.path.exists(st.session_state.get("static_site_zip", "")):
+        with open(st.session_state["static_site_zip"], "rb") as site_zip:
+            st.download_button(
+                label="Download Static Site (.zip)",
+                data=site_zip,
+                file_name="repp_site.zip",
+                mime="application/zip"
+            )
 
 
 
@@ -746,47 +924,20 @@ if page == "REPP":
 
 # Home Page: Apply customizations to each section
 elif page == "Home":
-    # Project Name Section
-    project_name_custom = st.session_state['project_data']["custom_text_name"]
-    st.markdown(f"""
-        <h1 style="font-size:{project_name_custom['font_size']}px; color:{project_name_custom['color']}; font-weight:{'bold' if project_name_custom['is_bold'] else 'normal'}; font-style:{'italic' if project_name_custom['is_italic'] else 'normal'}; font-family:{project_name_custom.get('font', 'Arial')}; text-align:center;">
-            {project_name_custom['content']}
-        </h1>
-    """, unsafe_allow_html=True)
-
-    # Team Members Section
-    team_custom = st.session_state['project_data']["custom_text_team"]
-    st.subheader("Team Members")
-    st.markdown(f"""
-        <div style="font-size:{team_custom['font_size']}px; color:{team_custom['color']}; font-weight:{'bold' if team_custom['is_bold'] else 'normal'}; font-style:{'italic' if team_custom['is_italic'] else 'normal'}; font-family:{team_custom.get('font', 'Arial')};">
-            {team_custom['content']}
-        </div>
-    """, unsafe_allow_html=True)
-
-        # Supervisor Section
-    st.subheader("Supervisor")
-    supervisor_custom = st.session_state['project_data']["custom_text_supervisor"]
-    st.markdown(f"""
-        <div style="font-size:{supervisor_custom['font_size']}px; color:{supervisor_custom['color']}; font-weight:{'bold' if supervisor_custom['is_bold'] else 'normal'}; font-style:{'italic' if supervisor_custom['is_italic'] else 'normal'}; font-family:{supervisor_custom.get('font', 'Arial')};">
-            {supervisor_custom['content']}
-        </div>
-    """, unsafe_allow_html=True)
-
-    # Project Details Section
-    st.subheader("Project Details")
-    details_custom = st.session_state['project_data']["custom_text_details"]
-    st.markdown(f"""
-        <div style="font-size:{details_custom['font_size']}px; color:{details_custom['color']}; font-weight:{'bold' if details_custom['is_bold'] else 'normal'}; font-style:{'italic' if details_custom['is_italic'] else 'normal'}; font-family:{details_custom.get('font', 'Arial')};">
-            {details_custom['content']}
-        </div>
-    """, unsafe_allow_html=True)
+    # Reuse the pre-rendered fragment until a customization field changes
+    if "home_render_key" not in st.session_state:
+        st.session_state["home_render_key"] = home_render_key(st.session_state['project_data'])
+    st.markdown(
+        render_home_fragment(st.session_state["home_render_key"], st.session_state['project_data']),
+        unsafe_allow_html=True
+    )
 
     # Display Uploaded Images
     st.subheader("Gallery")
-    images = st.session_state['project_data'].get("images", [])
+    images = artifact_page("images", "Images", filters=False)
     if images:
         for image in images:
-            st.image(image, caption=image.name, use_container_width=True)
+            st.image(image.path, caption=image.name, use_container_width=True)
     else:
         st.write("No images uploaded.")
 
@@ -803,14 +954,14 @@ elif page == "Dashboards and Datasets":
     # Display Dashboards
         # Display uploaded dashboards
     st.subheader("Dashboards")
-    dashboards = st.session_state['project_data'].get('dashboards', [])
+    dashboards = artifact_page("dashboards", "Dashboards")
     if dashboards:
-        for i, dashboard in enumerate(dashboards):
+        for dashboard in dashboards:
             st.download_button(
                 label=f"Download {dashboard.name}",
-                data=dashboard,
+                data=dashboard.getvalue(),
                 file_name=dashboard.name,
-                key=f"download_dashboard_{i}"  # Unique key
+                key=f"download_dashboard_{dashboard.id}"  # Unique key
             )
     else:
         st.write("No dashboards uploaded.")
@@ -818,10 +969,15 @@ elif page == "Dashboards and Datasets":
 
     # Display Datasets
     st.subheader("Uploaded Datasets")
-    datasets = st.session_state['project_data'].get("datasets", [])
+    datasets = artifact_page("datasets", "Datasets")
     if datasets:
         for dataset in datasets:
-            st.download_button(label=f"Download {dataset.name}", data=dataset, file_name=dataset.name)
+            st.download_button(
+                label=f"Download {dataset.name}",
+                data=dataset.getvalue(),
+                file_name=dataset.name,
+                key=f"download_dataset_{dataset.id}"
+            )
     else:
         st.write("No datasets uploaded.")
 
@@ -831,10 +987,15 @@ elif page == "Presentation":
 
     # Display Uploaded Presentations
     st.subheader("Uploaded Presentations")
-    presentations = st.session_state['project_data'].get("presentations", [])
+    presentations = artifact_page("presentations", "Presentations")
     if presentations:
         for presentation in presentations:
-            st.download_button(label=f"Download {presentation.name}", data=presentation, file_name=presentation.name)
+            st.download_button(
+                label=f"Download {presentation.name}",
+                data=presentation.getvalue(),
+                file_name=presentation.name,
+                key=f"download_presentation_{presentation.id}"
+            )
     else:
         st.write("No presentations uploaded.")
 
@@ -867,6 +1028,12 @@ elif page == "Query Assistant":
 
     This ensures that the query is fully processed and returns accurate results.
     """)
+    st.sidebar.checkbox(
+        "Conversation mode",
+        value=True,
+        key="conversation_mode",
+        help="Use earlier questions and answers to understand follow-up questions"
+    )
 
     # Chat history initialization
     if "chat_history" not in st.session_state:
@@ -875,53 +1042,86 @@ elif page == "Query Assistant":
     # File uploader for PDF
     pdf_file = st.file_uploader("Upload a PDF for Chatbot", type="pdf")
     if pdf_file:
-        # Load and preprocess the PDF
-        reader = PdfReader(pdf_file)
-        text = " ".join([page.extract_text() for page in reader.pages if page.extract_text()])
-        cleaned_text = text.replace("\n", " ").strip()
-
-        # Split text into chunks for vector storage
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        chunks = splitter.split_text(cleaned_text)
+        # Heavy RAG imports are deferred until a PDF is actually uploaded
+        import rag_pipeline
+        import conversation
+
+        # Load the document's FAISS index (built only the first time this PDF is seen).
+        # Only the first run after an upload counts as opening the document
+        opened = st.session_state.get("opened_pdf_id") != pdf_file.file_id
+        try:
+            doc_hash, vector_store = rag_pipeline.get_document_index(
+                pdf_file, user=st.session_state.get("user_email"), opened=opened
+            )
+        except admission.AdmissionError as err:
+            st.warning(f"⏳ {err}")
+            st.stop()
+        st.session_state["opened_pdf_id"] = pdf_file.file_id
+        chat_log_path = chat_history.log_path(st.session_state["chat_log_id"])
 
-        # Generate embeddings and create FAISS index
-        embeddings = OpenAIEmbeddings()
-        vector_store = FAISS.from_texts(chunks, embeddings)
-        vector_store.save_local("uploaded_pdf")
+        # Conversation state follows the document; a new PDF starts a new conversation
+        if st.session_state.get("conversation", {}).get("doc") != doc_hash:
+            st.session_state["conversation"] = conversation.new_state(doc_hash)
 
         # RAG function
-        def rag(query, n_results=5):
-            docs = vector_store.similarity_search(query, k=n_results)
-            joined_information = "\n".join([doc.page_content for doc in docs])
-
-            # Use structured prompt
-            prompt = f"""
-            You are a knowledgeable assistant. Use the provided document context to answer the following question:
-            Context: {joined_information}
-            Question: {query}
-            Answer concisely and accurately.
-            """
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}]
+        # Re-ranked top 3 of 30 candidates (see reranker.py) instead of the raw top 5
+        def rag(query, n_results=3):
+            # Rate limited per user and run in a fair-share interactive slot;
+            # per-question timings and tokens go to the analytics sink
+            user = st.session_state.get("user_email")
+            admission.QUERY_LIMITER.check(user)
+            with METRICS.trace() as trace, admission.INTERACTIVE.slot(user):
+                answer, sources = answer_question(query, n_results)
+            cache = "coalesced" if "llm_coalesced" in trace.stages_ms else "miss"
+            analytics.record("query", doc_hash=doc_hash, query=query, trace=trace, cache=cache)
+            return answer, sources
+
+        def answer_question(query, n_results):
+            if not st.session_state.get("conversation_mode", True):
+                return rag_pipeline.rag(vector_store, query, n_results=n_results)
+            # Retrieve with a standalone rewrite of follow-ups and send a
+            # token-capped history, so each turn costs the same
+            chat = rag_pipeline.default_chat()
+            convo = st.session_state["conversation"]
+            standalone_query = conversation.condense_question(convo, query, chat)
+            answer, sources = rag_pipeline.rag(
+                vector_store, standalone_query, n_results=n_results, chat=chat,
+                history=conversation.history_text(convo)
             )
-            return response.choices[0].message.content, docs
+            conversation.record_turn(convo, query, answer, chat)
+            return answer, sources
 
             # Chat interface in container
         chat_container = st.container()
 
         with chat_container:
-        # Display chat history
-            for message in st.session_state.chat_history:
+        # Display one page of chat history (the newest page unless the user goes back)
+            chat_pages = chat_history.page_count(st.session_state.chat_history, st.session_state["chat_spilled"])
+            chat_page = chat_pages
+            if chat_pages > 1:
+                chat_page = st.number_input("Conversation page", min_value=1, max_value=chat_pages, value=chat_pages)
+            for message in chat_history.page_messages(
+                st.session_state.chat_history, st.session_state["chat_spilled"], chat_log_path, chat_page
+            ):
                 if message["role"] == "user":
                     st.markdown(f"<div class='chat-message user-message'>💭 You: {message['content']}</div>", 
                         unsafe_allow_html=True)
                 else:
+                    source_refs = ", ".join(f"chunk {source['chunk']}" for source in message.get("sources", []))
                     st.markdown(f"""
                     <div class='chat-message assistant-message'>
                         <div style='margin-bottom: 0.5rem;'>📘 Assistant: {message['response']}</div>
+                        <div style='font-size: 0.8rem; color: grey;'>Sources: {source_refs}</div>
                     </div>
                 """, unsafe_allow_html=True)
+                    # Source text is looked up by chunk ID in the open document's index
+                    if message.get("sources") and message.get("doc") == doc_hash:
+                        with st.expander("Show sources"):
+                            for source in message["sources"]:
+                                chunk = rag_pipeline.get_chunk(vector_store, source["chunk"])
+                                if chunk is not None:
+                                    st.caption(f"Chunk {source['chunk']} (score {source['score']})")
+                                    st.text(chunk.page_content[:SOURCE_SNIPPET_CHARS])
 
     # If there's a current question in the session state, use it as the default value
         user_query = st.text_input(
@@ -957,25 +1157,35 @@ elif page == "Query Assistant":
                 st.warning("⚠️ Please enter a question!")
             else:
             # Append user's query to chat history
-                st.session_state.chat_history.append({"role": "user", "content": user_query})
+                st.session_state["chat_spilled"] += chat_history.append_message(
+                    st.session_state.chat_history, {"role": "user", "content": user_query}, chat_log_path
+                )
             
                 with st.spinner("🔍 Analyzing sources..."):
                     try:
                     # Call the RAG function and get response and sources
                         response, sources = rag(user_query)
                     
-                    # Append assistant's response to chat history
-                        st.session_state.chat_history.append({
-                            "role": "assistant",
-                            "response": response,
-                            "sources": sources
-                        })
+                    # Append assistant's response to chat history, keeping only
+                    # chunk IDs and scores instead of the full Documents
+                        st.session_state["chat_spilled"] += chat_history.append_message(
+                            st.session_state.chat_history,
+                            {
+                                "role": "assistant",
+                                "response": response,
+                                "doc": doc_hash,
+                                "sources": chat_history.compact_sources(sources)
+                            },
+                            chat_log_path
+                        )
                     
                     # Clear the current question after processing
                         st.session_state.current_question = ''
                     
                     # Update app state to refresh UI
                         st.session_state['force_rerun'] = True  # Trigger UI update
+                    except admission.AdmissionError as e:
+                        st.warning(f"⏳ {e}")
                     except Exception as e:
                     # Log and display a detailed error message
                         st.error(f"⚠️ An error occurred while processing your query: {str(e)}")
@@ -988,6 +1198,9 @@ elif page == "Query Assistant":
         if st.sidebar.button("Clear Chat History"):
             # Clear the chat history and reset current question
             st.session_state.chat_history = []
+            chat_history.clear(chat_log_path)
+            st.session_state["chat_spilled"] = 0
+            st.session_state.pop("conversation", None)
             st.session_state.current_question = ""  # Reset the input box
             st.rerun()  # Immediately refresh the app to reflect changes
 
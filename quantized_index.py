@@ -0,0 +1,145 @@
+"""Compressed FAISS storage for Query Assistant indexes.
+
+A flat index keeps every 1536-dim embedding as float32 (6 KB per chunk) in
+memory. With REPP_INDEX_STORAGE set, new indexes are stored compressed:
+
+    fp16  scalar quantization, 2 bytes per dimension   (2x smaller)
+    int8  scalar quantization, 1 byte per dimension    (4x smaller)
+    pq    product quantization, 1 byte per 16 dims     (15-35x smaller for
+          5k-20k chunks once the codebooks are counted)
+
+The compressed index only picks candidates. The original float32 vectors
+are saved next to it as ``vectors.npy`` and memory-mapped, so the
+``k * RERANK_FACTOR`` candidates are re-ranked with exact distances while
+the full-precision vectors stay on disk. Scores are therefore the same
+squared L2 distances a flat index returns. bench_quant.py measures the
+recall and memory trade-off.
+"""
+
+import json
+import os
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+STORAGE_MODES = ("flat", "fp16", "int8", "pq")
+INDEX_STORAGE = os.getenv("REPP_INDEX_STORAGE", "flat")
+RERANK_FACTOR = int(os.getenv("REPP_RERANK_FACTOR", "4"))
+
+STORAGE_FILE = "storage.json"
+VECTORS_FILE = "vectors.npy"
+
+# PQ codebooks (256 float32 centroids per sub-quantizer, 1.5 MB at 1536
+# dims) only pay off, and only train well, on larger documents; smaller
+# ones fall back to int8
+PQ_MIN_VECTORS = 2048
+
+
+def _pq_index(dim):
+    subquantizers = max(1, dim // 16)
+    while dim % subquantizers:
+        subquantizers -= 1
+    return faiss.IndexPQ(dim, subquantizers, 8)
+
+
+def make_index(vectors, storage):
+    """Build and fill a FAISS index of the given storage mode."""
+    count, dim = vectors.shape
+    if storage == "pq" and count < PQ_MIN_VECTORS:
+        storage = "int8"
+    if storage == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif storage == "fp16":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16)
+    elif storage == "int8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+    elif storage == "pq":
+        index = _pq_index(dim)
+    else:
+        raise ValueError(f"Unknown index storage {storage!r}, expected one of {STORAGE_MODES}")
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+class QuantizedFAISS(FAISS):
+    """LangChain FAISS store over a compressed index with exact re-ranking.
+
+    The store is read-only: documents are indexed once at upload, so adding
+    texts later is not supported (rebuild the index instead).
+    """
+
+    storage = "flat"
+    rerank_factor = RERANK_FACTOR
+    _vectors = None
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        if filter is not None or self._vectors is None:
+            return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+        query = np.asarray(embedding, dtype="float32")
+        _, rows = self.index.search(query[None, :], k * self.rerank_factor)
+        rows = rows[0][rows[0] >= 0]
+        # Exact squared L2 distances from the memory-mapped originals
+        candidates = np.asarray(self._vectors[rows], dtype="float32")
+        distances = ((candidates - query) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:k]
+        return [
+            (self.docstore.search(self.index_to_docstore_id[int(rows[j])]), float(distances[j]))
+            for j in order
+        ]
+
+    def add_texts(self, *args, **kwargs):
+        raise NotImplementedError("QuantizedFAISS indexes are read-only; rebuild the index instead")
+
+    def add_embeddings(self, *args, **kwargs):
+        raise NotImplementedError("QuantizedFAISS indexes are read-only; rebuild the index instead")
+
+    def save_local(self, folder_path, index_name="index"):
+        super().save_local(folder_path, index_name)
+        vectors_path = os.path.join(folder_path, VECTORS_FILE)
+        np.save(vectors_path, np.asarray(self._vectors, dtype="float32"))
+        with open(os.path.join(folder_path, STORAGE_FILE), "w", encoding="utf-8") as f:
+            json.dump({"storage": self.storage, "vectors": VECTORS_FILE}, f)
+        # From now on only the compressed index stays resident
+        self._vectors = np.load(vectors_path, mmap_mode="r")
+
+    @classmethod
+    def load_local(cls, folder_path, embeddings, index_name="index", **kwargs):
+        store = super().load_local(folder_path, embeddings, index_name, **kwargs)
+        with open(os.path.join(folder_path, STORAGE_FILE), encoding="utf-8") as f:
+            store.storage = json.load(f)["storage"]
+        store._vectors = np.load(os.path.join(folder_path, VECTORS_FILE), mmap_mode="r")
+        return store
+
+
+def quantize_store(vector_store, storage, vectors=None):
+    """Return a compressed copy of a flat FAISS store sharing its documents.
+
+    ``vectors`` are the store's original embeddings; they are read back
+    from the flat index when not given.
+    """
+    if vectors is None:
+        vectors = vector_store.index.reconstruct_n(0, vector_store.index.ntotal)
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    quantized = QuantizedFAISS(
+        vector_store.embedding_function,
+        make_index(vectors, storage),
+        vector_store.docstore,
+        vector_store.index_to_docstore_id,
+    )
+    quantized.storage = storage
+    quantized._vectors = vectors
+    return quantized
+
+
+def load_store(folder_path, embeddings):
+    """Load a saved index, compressed or flat, from ``folder_path``."""
+    store_cls = QuantizedFAISS if os.path.exists(os.path.join(folder_path, STORAGE_FILE)) else FAISS
+    return store_cls.load_local(folder_path, embeddings, allow_dangerous_deserialization=True)
+
+
+def index_memory_bytes(vector_store):
+    """Size of the resident FAISS index (the serialized form is a close proxy)."""
+    return faiss.serialize_index(vector_store.index).nbytes
@@ -0,0 +1,93 @@
+"""Deterministic offline stand-ins for the OpenAI embedding and chat backends.
+
+Used by the benchmark and load-test harnesses so the Query Assistant
+pipeline can be measured without network access or API keys. Both fakes
+can inject a configurable latency to model the real services.
+"""
+
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+WORD_RE = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words vectors, normalized like OpenAI embeddings.
+
+    Texts sharing words get similar vectors, so similarity search behaves
+    plausibly. ``latency`` seconds are slept per request of ``batch_size``
+    texts, mirroring how OpenAIEmbeddings batches its API calls.
+    """
+
+    def __init__(self, size=1536, latency=0.0, batch_size=1000):
+        self.size = size
+        self.latency = latency
+        self.batch_size = batch_size
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in WORD_RE.findall(text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            if self.latency:
+                time.sleep(self.latency)
+            vectors.extend(self._embed(text) for text in texts[start:start + self.batch_size])
+        return vectors
+
+    def embed_query(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embed(text)
+
+
+class FakeChatResponse(dict):
+    """Dict with attribute access, shaped like an openai 0.28 response."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FakeChatCompletion:
+    """Stand-in for ``openai.ChatCompletion`` with a deterministic answer."""
+
+    def __init__(self, latency=0.0, answer_words=40):
+        self.latency = latency
+        self.answer_words = answer_words
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = "\n".join(message["content"] for message in messages)
+        words = WORD_RE.findall(prompt)
+        answer = " ".join(words[-self.answer_words:]) or "No answer."
+        # Roughly four characters per token, like OpenAI's rule of thumb
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(answer) // 4
+        return FakeChatResponse(
+            model=model,
+            choices=[FakeChatResponse(message=FakeChatResponse(role="assistant", content=answer))],
+            usage=FakeChatResponse(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=prompt_tokens + completion_tokens,
+            ),
+        )
@@ -0,0 +1,233 @@
+"""Lightweight per-stage timing for the RAG pipeline.
+
+Every stage of the Query Assistant (PDF extraction, splitting, embedding,
+index build, save, search, LLM call) is wrapped in ``METRICS.stage(name)``.
+The registry keeps call and error counts, item/byte/token totals and a
+latency histogram per stage, and can render them as a table for the admin
+sidebar panel or as Prometheus text exposition (HTTP endpoint or file dump).
+``METRICS.trace()`` additionally collects the stages of a single request
+(e.g. one question) for per-event analytics.
+Only the standard library is used so importing this module is cheap.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+# Recent samples kept per stage for percentile estimates
+SAMPLE_WINDOW = 2048
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageStats:
+    """Counters and latency histogram for one pipeline stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.items = 0
+        self.bytes = 0
+        self.tokens = 0
+        self.seconds_total = 0.0
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, seconds, error=False, items=0, nbytes=0, tokens=0):
+        self.calls += 1
+        self.errors += int(error)
+        self.items += items
+        self.bytes += nbytes
+        self.tokens += tokens
+        self.seconds_total += seconds
+        self.samples.append(seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """Latency quantile over the recent sample window (nearest rank)."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class Span:
+    """Mutable record handed to the ``with`` block so it can report sizes."""
+
+    __slots__ = ("items", "bytes", "tokens")
+
+    def __init__(self):
+        self.items = 0
+        self.bytes = 0
+        self.tokens = 0
+
+
+class Trace:
+    """Stage timings and tokens of one request, filled in by ``stage()``."""
+
+    __slots__ = ("stages_ms", "tokens")
+
+    def __init__(self):
+        self.stages_ms = {}
+        self.tokens = 0
+
+    @property
+    def total_ms(self):
+        return round(sum(self.stages_ms.values()), 3)
+
+
+class MetricsRegistry:
+    """Thread-safe collection of StageStats keyed by stage name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._local = threading.local()
+
+    @contextmanager
+    def trace(self):
+        """Collect the stages run by this thread inside the block."""
+        previous = getattr(self._local, "trace", None)
+        trace = self._local.trace = Trace()
+        try:
+            yield trace
+        finally:
+            self._local.trace = previous
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one call of stage ``name``."""
+        span = Span()
+        start = time.perf_counter()
+        error = False
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._stages.setdefault(name, StageStats())
+                stats.observe(elapsed, error=error, items=span.items, nbytes=span.bytes, tokens=span.tokens)
+            trace = getattr(self._local, "trace", None)
+            if trace is not None:
+                trace.stages_ms[name] = round(trace.stages_ms.get(name, 0.0) + elapsed * 1000, 3)
+                trace.tokens += span.tokens
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def snapshot(self):
+        """Summary rows, one dict per stage, for tables and reports."""
+        rows = []
+        with self._lock:
+            for name, stats in self._stages.items():
+                row = {
+                    "stage": name,
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "items": stats.items,
+                    "bytes": stats.bytes,
+                    "tokens": stats.tokens,
+                    "total_s": round(stats.seconds_total, 4),
+                }
+                for q in QUANTILES:
+                    value = stats.quantile(q)
+                    row[f"p{int(q * 100)}_ms"] = None if value is None else round(value * 1000, 2)
+                rows.append(row)
+        return rows
+
+    def render_prometheus(self, prefix="repp_rag_stage"):
+        """Render all stages in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_seconds Latency of RAG pipeline stages.",
+            f"# TYPE {prefix}_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for name, stats in stages:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.bucket_counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{prefix}_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_seconds_sum{{stage="{name}"}} {stats.seconds_total:.6f}')
+                lines.append(f'{prefix}_seconds_count{{stage="{name}"}} {stats.calls}')
+
+            lines.append(f"# HELP {prefix}_latency_quantile_seconds Recent latency quantiles of RAG pipeline stages.")
+            lines.append(f"# TYPE {prefix}_latency_quantile_seconds gauge")
+            for name, stats in stages:
+                for q in QUANTILES:
+                    value = stats.quantile(q)
+                    if value is not None:
+                        lines.append(f'{prefix}_latency_quantile_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+
+            for field, help_text in (("errors", "Failed calls"), ("items", "Items processed"),
+                                     ("bytes", "Bytes processed"), ("tokens", "Tokens consumed")):
+                lines.append(f"# HELP {prefix}_{field}_total {help_text} per RAG pipeline stage.")
+                lines.append(f"# TYPE {prefix}_{field}_total counter")
+                for name, stats in stages:
+                    lines.append(f'{prefix}_{field}_total{{stage="{name}"}} {getattr(stats, field)}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the Prometheus text to ``path`` atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+# Process-wide registry shared by every session
+METRICS = MetricsRegistry()
+
+
+def start_http_server(port, registry=METRICS, host="0.0.0.0"):
+    """Serve ``/metrics`` in Prometheus format from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_file_dumper(path, interval=15.0, registry=METRICS):
+    """Rewrite ``path`` with the Prometheus text every ``interval`` seconds."""
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                registry.dump(path)
+            except OSError as err:
+                print(f"Could not write metrics file '{path}': {err}")
+
+    thread = threading.Thread(target=loop, name="repp-metrics-dump", daemon=True)
+    thread.start()
+    return thread
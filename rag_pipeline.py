@@ -0,0 +1,357 @@
+"""RAG pipeline used by the Query Assistant page.
+
+This module pulls in the heavy LangChain, FAISS, OpenAI and PyPDF2 stacks,
+so mainapp.py only imports it once a user actually uploads a PDF on the
+Query Assistant page. The login page never pays for these imports.
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import openai
+from PyPDF2 import PdfReader
+from langchain_community.vectorstores import FAISS
+from langchain.embeddings import OpenAIEmbeddings
+
+import admission
+import analytics
+import chunker
+import quantized_index
+import reranker
+from rag_metrics import METRICS
+from singleflight import SingleFlight, normalize_query
+
+openai.api_key = os.getenv("OPENAI_API_KEY")
+
+# REPP_OFFLINE_BACKENDS=1 swaps OpenAI for the deterministic fakes in
+# rag_fakes.py (used by the load-test harness); latencies are in seconds
+OFFLINE_BACKENDS = os.getenv("REPP_OFFLINE_BACKENDS", "") not in ("", "0")
+_offline_chat = None
+
+# Each uploaded PDF gets its own saved index under INDEX_DIR/<document hash>;
+# the most recently used ones also stay loaded in memory for every session
+INDEX_DIR = os.getenv("REPP_INDEX_DIR", "indexes")
+INDEX_CACHE_SIZE = int(os.getenv("REPP_INDEX_CACHE_SIZE", "8"))
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+# How often each document is opened, so warmup.py can preload the popular
+# ones; saved to USAGE_FILE at most every USAGE_SAVE_INTERVAL seconds
+USAGE_FILE = os.path.join(INDEX_DIR, "usage.json")
+USAGE_SAVE_INTERVAL = 30
+_usage = None
+_usage_saved_at = float("-inf")
+_usage_lock = threading.Lock()
+
+# Identical concurrent ingestions and LLM calls share one execution
+_ingest_flight = SingleFlight("ingest")
+_llm_flight = SingleFlight("llm")
+
+
+def default_embeddings():
+    """Embedding backend used when the caller does not pass one."""
+    if OFFLINE_BACKENDS:
+        from rag_fakes import FakeEmbeddings
+        return FakeEmbeddings(latency=float(os.getenv("REPP_FAKE_EMBED_LATENCY", "0")))
+    return OpenAIEmbeddings()
+
+
+def default_chat():
+    """ChatCompletion ``create`` callable used when the caller does not pass one."""
+    global _offline_chat
+    if OFFLINE_BACKENDS:
+        if _offline_chat is None:
+            from rag_fakes import FakeChatCompletion
+            _offline_chat = FakeChatCompletion(latency=float(os.getenv("REPP_FAKE_CHAT_LATENCY", "0")))
+        return _offline_chat.create
+    return openai.ChatCompletion.create
+
+
+def extract_pages(pdf_file):
+    """Extract the text of every page of a PDF, one string per page."""
+    with METRICS.stage("pdf_extract") as span:
+        reader = PdfReader(pdf_file)
+        # extract_text() is expensive, so call it once per page
+        page_texts = [page.extract_text() or "" for page in reader.pages]
+        span.items = len(page_texts)
+        span.bytes = getattr(pdf_file, "size", 0)
+    return page_texts
+
+
+def split_pages(page_texts):
+    """Split page texts into token-bounded chunks for vector storage (see chunker.py)."""
+    with METRICS.stage("split") as span:
+        chunks = chunker.chunk_pages(page_texts)
+        span.items = len(chunks)
+        span.bytes = sum(len(page_text.encode("utf-8")) for page_text in page_texts)
+    return chunks
+
+
+def build_vector_store(chunks, save_path="uploaded_pdf", embeddings=None, storage=None):
+    """Generate embeddings, create the FAISS index and save it locally.
+
+    Chunks are stored under their position as ID (``"0"``, ``"1"``, ...) so
+    chat history can reference them compactly. ``embeddings`` defaults to
+    OpenAIEmbeddings; benchmarks pass a fake. ``storage`` picks the index
+    compression (see quantized_index.py) and defaults to REPP_INDEX_STORAGE.
+    The index appears at ``save_path`` complete or not at all; if another
+    process saved it there first, that copy is kept.
+    """
+    if embeddings is None:
+        embeddings = default_embeddings()
+
+    # Same work as FAISS.from_texts, split so each stage is timed separately
+    with METRICS.stage("embed") as span:
+        vectors = embeddings.embed_documents(chunks)
+        span.items = len(chunks)
+        span.bytes = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+
+    with METRICS.stage("index_build") as span:
+        vector_store = FAISS.from_embeddings(
+            list(zip(chunks, vectors)), embeddings,
+            metadatas=[{"chunk": i} for i in range(len(chunks))],
+            ids=[str(i) for i in range(len(chunks))]
+        )
+        storage = storage or quantized_index.INDEX_STORAGE
+        if storage != "flat":
+            vector_store = quantized_index.quantize_store(vector_store, storage, vectors)
+        span.items = len(vectors)
+
+    with METRICS.stage("save_local") as span:
+        _save_atomically(vector_store, save_path)
+        span.items = len(vectors)
+    return vector_store
+
+
+def _save_atomically(vector_store, save_path):
+    """Save into a temporary sibling directory, then rename it into place.
+
+    save_local() writes its files one at a time, so a crash or a reader in
+    another worker could otherwise see a half-written index.
+    """
+    tmp_path = f"{save_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    vector_store.save_local(tmp_path)
+    try:
+        os.replace(tmp_path, save_path)
+    except OSError:
+        if not os.path.isdir(save_path):
+            raise
+        # Another worker finished the same index first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def document_hash(data):
+    """Content hash identifying an uploaded document."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_bytes(pdf_file):
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    with open(pdf_file, "rb") as f:
+        return f.read()
+
+
+def _cache_put(doc_hash, vector_store):
+    with _index_cache_lock:
+        _index_cache[doc_hash] = vector_store
+        _index_cache.move_to_end(doc_hash)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+
+def get_document_index(pdf_file, embeddings=None, user=None, opened=True):
+    """Return ``(doc_hash, vector_store)`` for an uploaded PDF or a file path.
+
+    The index is taken from memory, else loaded from INDEX_DIR, and only
+    built from scratch the first time a document is seen, so reruns of the
+    Query Assistant page no longer re-embed the whole PDF. Where the index
+    came from (memory, disk, built or coalesced) is sent to analytics.py.
+    Building counts against ``user``'s upload rate limit and waits for a
+    bulk slot (see admission.py); memory and disk hits are free.
+
+    Pass ``opened=False`` on reruns for a document the session already
+    has open, so they are not counted as opens (usage ranking, analytics).
+    """
+    data = _file_bytes(pdf_file)
+    doc_hash = document_hash(data)
+    if opened:
+        _record_use(doc_hash)
+    with METRICS.trace() as trace:
+        vector_store = _cache_get(doc_hash)
+        cache = "memory"
+        if vector_store is None:
+            # Sessions uploading the same PDF at once wait for a single ingestion
+            vector_store, shared = _ingest_flight.do(doc_hash, lambda: _load_or_build(doc_hash, data, embeddings, user))
+            if shared:
+                cache = "coalesced"
+            else:
+                cache = "built" if "embed" in trace.stages_ms else "disk"
+    if opened:
+        analytics.record("ingest", doc_hash=doc_hash, trace=trace, cache=cache)
+    return doc_hash, vector_store
+
+
+def _cache_get(doc_hash):
+    with _index_cache_lock:
+        vector_store = _index_cache.get(doc_hash)
+        if vector_store is not None:
+            _index_cache.move_to_end(doc_hash)
+        return vector_store
+
+
+def _load_or_build(doc_hash, data, embeddings, user=None):
+    # Another flight may have finished between the caller's cache check and now
+    vector_store = _cache_get(doc_hash)
+    if vector_store is not None:
+        return vector_store
+
+    if embeddings is None:
+        embeddings = default_embeddings()
+    index_path = os.path.join(INDEX_DIR, doc_hash)
+    vector_store = None
+    if os.path.isdir(index_path):
+        try:
+            vector_store = _load_index(index_path, embeddings)
+        except Exception as err:
+            # Left broken by a crash before saves were atomic; build it again
+            print(f"Could not load index {index_path}, rebuilding it: {err}")
+            shutil.rmtree(index_path, ignore_errors=True)
+    if vector_store is None:
+        if user is not None:
+            admission.INGEST_LIMITER.check(user)
+        with admission.BULK.slot(user):
+            pdf_stream = io.BytesIO(data)
+            pdf_stream.size = len(data)
+            chunks = split_pages(extract_pages(pdf_stream))
+            vector_store = build_vector_store(chunks, save_path=index_path, embeddings=embeddings)
+    _cache_put(doc_hash, vector_store)
+    return vector_store
+
+
+def _load_index(index_path, embeddings):
+    with METRICS.stage("index_load") as span:
+        vector_store = quantized_index.load_store(index_path, embeddings)
+        span.items = vector_store.index.ntotal
+    return vector_store
+
+
+def preload_index(key, index_path, embeddings=None):
+    """Load a saved index into the shared cache under ``key`` (warmup)."""
+    def load():
+        vector_store = _cache_get(key)
+        if vector_store is None:
+            vector_store = _load_index(index_path, embeddings or default_embeddings())
+            _cache_put(key, vector_store)
+        return vector_store
+
+    vector_store, _ = _ingest_flight.do(key, load)
+    return vector_store
+
+
+def _load_usage():
+    global _usage
+    if _usage is None:
+        try:
+            with open(USAGE_FILE, encoding="utf-8") as f:
+                _usage = Counter(json.load(f))
+        except (OSError, ValueError):
+            _usage = Counter()
+    return _usage
+
+
+def _record_use(doc_hash):
+    global _usage_saved_at
+    with _usage_lock:
+        usage = _load_usage()
+        usage[doc_hash] += 1
+        if time.monotonic() - _usage_saved_at < USAGE_SAVE_INTERVAL:
+            return
+        _usage_saved_at = time.monotonic()
+        try:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            tmp_path = USAGE_FILE + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(usage, f)
+            os.replace(tmp_path, USAGE_FILE)
+        except OSError as err:
+            print(f"Could not save index usage: {err}")
+
+
+def most_used(n):
+    """Hashes of the ``n`` most opened documents that still have a saved index."""
+    with _usage_lock:
+        ranked = [doc_hash for doc_hash, _ in _load_usage().most_common()]
+    return [h for h in ranked if os.path.isdir(os.path.join(INDEX_DIR, h))][:n]
+
+
+def get_chunk(vector_store, chunk_id):
+    """Look up a stored chunk by the ID kept in chat history; None if unknown."""
+    doc = vector_store.docstore.search(str(chunk_id))
+    # InMemoryDocstore returns a "not found" message instead of raising
+    return None if isinstance(doc, str) else doc
+
+
+def rag(vector_store, query, n_results=5, chat=None, history=""):
+    """Answer a question from the indexed document.
+
+    ``history`` is an optional, already token-capped conversation history
+    (see conversation.py) added to the prompt. Returns
+    ``(answer, scored_docs)`` where ``scored_docs`` is a list of
+    ``(Document, distance)`` pairs, best first.
+
+    FAISS is asked for REPP_RERANK_CANDIDATES chunks and reranker.py keeps
+    the ``n_results`` best of them for the prompt.
+
+    ``chat`` is a ChatCompletion-style ``create`` callable and defaults to
+    ``openai.ChatCompletion.create``; benchmarks pass a fake.
+    """
+    if chat is None:
+        chat = default_chat()
+    with METRICS.stage("similarity_search") as span:
+        scored_docs = vector_store.similarity_search_with_score(
+            query, k=max(n_results, reranker.RERANK_CANDIDATES)
+        )
+        span.items = len(scored_docs)
+    if len(scored_docs) > n_results:
+        scored_docs = reranker.rerank(query, scored_docs, n_results)
+    docs = [doc for doc, _ in scored_docs]
+    joined_information = "\n".join([doc.page_content for doc in docs])
+
+    # Use structured prompt
+    prompt = f"""
+    You are a knowledgeable assistant. Use the provided document context to answer the following question:
+    Context: {joined_information}
+    Question: {query}
+    Answer concisely and accurately.
+    """
+    if history:
+        prompt += f"""Conversation so far (for reference only): {history}
+    """
+    def ask_llm():
+        with METRICS.stage("llm") as span:
+            response = chat(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}]
+            )
+            span.items = 1
+            span.bytes = len(prompt.encode("utf-8"))
+            usage = response.get("usage") or {}
+            span.tokens = usage.get("total_tokens", 0)
+        return response
+
+    # The retrieved context stands in for the document, so the same question
+    # on the same document with the same history shares one LLM call
+    flight_key = (
+        normalize_query(query),
+        document_hash(joined_information.encode("utf-8")),
+        document_hash(history.encode("utf-8")),
+    )
+    response, _ = _llm_flight.do(flight_key, ask_llm)
+    return response.choices[0].message.content, scored_docs
@@ -0,0 +1,94 @@
+"""CPU-local re-ranking of retrieved chunks before they go to the LLM.
+
+rag() over-fetches RERANK_CANDIDATES chunks from FAISS and this module
+keeps the best few. Each candidate gets a BM25 score for the question
+terms (with IDF taken over the candidate pool) blended with its
+normalized vector similarity, and near-duplicate chunks (the splitter's
+overlap makes neighbours similar) are passed over; they only fill the
+remaining places, best first, when too few distinct chunks are left. Everything is vectorized
+NumPy, so it costs a millisecond or two for 30 candidates.
+
+Candidates arrive closest first and are tokenized in batches; if
+RERANK_BUDGET_MS runs out, the choice is made among the candidates
+tokenized so far.
+"""
+
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from rag_metrics import METRICS
+
+# 0 disables re-ranking; rag() then uses the raw nearest neighbours
+RERANK_CANDIDATES = int(os.getenv("REPP_RERANK_CANDIDATES", "30"))
+RERANK_BUDGET_MS = float(os.getenv("REPP_RERANK_BUDGET_MS", "50"))
+BATCH_SIZE = 10
+
+SEMANTIC_WEIGHT = 0.5
+DUPLICATE_OVERLAP = 0.8
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it its of on or "
+    "that the their this to was were what when which who why with about".split()
+)
+
+
+def terms(text):
+    return [word for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def _bm25(query_terms, doc_terms):
+    """BM25 of every document for the query, IDF over these documents."""
+    counts = [Counter(words) for words in doc_terms]
+    tf = np.array([[c[term] for term in query_terms] for c in counts], dtype="float32")
+    lengths = np.array([len(words) for words in doc_terms], dtype="float32")
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log(1 + (len(doc_terms) - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (BM25_K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def _unit(values):
+    spread = values.max() - values.min()
+    return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+
+def rerank(query, scored_docs, top_n, budget_ms=RERANK_BUDGET_MS):
+    """Best ``top_n`` of ``(Document, distance)`` pairs, best first."""
+    with METRICS.stage("rerank") as span:
+        deadline = time.perf_counter() + budget_ms / 1000
+        doc_terms = []
+        for start in range(0, len(scored_docs), BATCH_SIZE):
+            batch = scored_docs[start:start + BATCH_SIZE]
+            doc_terms.extend(terms(doc.page_content) for doc, _ in batch)
+            if time.perf_counter() > deadline:
+                break
+        pool = scored_docs[:len(doc_terms)]
+        span.items = len(pool)
+
+        query_terms = sorted(set(terms(query)))
+        distances = np.array([distance for _, distance in pool], dtype="float32")
+        score = SEMANTIC_WEIGHT * _unit(-distances)
+        if query_terms:
+            score += (1 - SEMANTIC_WEIGHT) * _unit(_bm25(query_terms, doc_terms))
+
+        kept, kept_terms, skipped = [], [], []
+        for i in np.argsort(-score, kind="stable"):
+            words = set(doc_terms[i])
+            if any(len(words & other) > DUPLICATE_OVERLAP * min(len(words), len(other)) for other in kept_terms):
+                skipped.append(i)
+                continue
+            kept.append(i)
+            kept_terms.append(words)
+            if len(kept) == top_n:
+                break
+        # Never send fewer than top_n chunks while candidates remain
+        kept.extend(skipped[:top_n - len(kept)])
+        kept.sort(key=lambda i: -score[i])
+    return [pool[i] for i in kept]
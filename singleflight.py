@@ -0,0 +1,71 @@
+"""Process-level request coalescing ("single flight").
+
+When several Streamlit sessions ask for the same expensive result at the
+same time (a class uploading the same report, everyone clicking the same
+example question), only the first caller runs the work; the others wait
+for it and get the same result or exception. Nothing is cached after the
+call finishes; that is left to the callers' own caches.
+"""
+
+import re
+import threading
+
+from rag_metrics import METRICS
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one in-flight execution per key."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Return ``(result, shared)``; ``shared`` is True for coalesced callers."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            with METRICS.stage(f"{self.name}_coalesced") as span:
+                call.done.wait()
+                span.items = 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        """Number of keys currently executing."""
+        with self._lock:
+            return len(self._calls)
+
+
+def normalize_query(query):
+    """Case, whitespace and trailing punctuation insensitive form of a question."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!. ").lower()
@@ -0,0 +1,143 @@
+"""Startup-time report for mainapp.py.
+
+Breaks down import cost by package for the modules the login page needs
+eagerly and for the stacks that are loaded lazily later (the RAG pipeline
+and the MySQL connector), then times a cold first run of the login page.
+
+Usage:
+    python startup_report.py            # human readable table
+    python startup_report.py --json     # machine readable output
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def eager_imports(path=os.path.join(APP_DIR, "mainapp.py")):
+    """``import`` statement for mainapp.py's module-level imports.
+
+    These are paid before the login page can render. Imports nested in
+    functions or page branches are lazy and left out.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return "import " + ", ".join(dict.fromkeys(modules))
+
+
+EAGER_IMPORTS = eager_imports()
+
+# Stacks that mainapp.py only imports when a page first needs them
+LAZY_GROUPS = {
+    "Query Assistant (rag_pipeline)": "import rag_pipeline",
+    "Uploads DB (mysql.connector)": "import mysql.connector",
+}
+
+MARKER = "--startup-report-marker--"
+
+LOGIN_PAGE_SCRIPT = """
+import json, time, warnings
+start = time.perf_counter()
+warnings.filterwarnings("ignore")
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("mainapp.py", default_timeout=300)
+at.run()
+print(json.dumps({"seconds": time.perf_counter() - start, "error": bool(at.exception)}))
+"""
+
+
+def _importtime(code, after=None):
+    """Run ``code`` under ``-X importtime`` in a fresh interpreter.
+
+    When ``after`` is given it is imported first and excluded from the
+    result, so only the incremental cost of ``code`` is reported.
+    Returns ``{package: self_time_us}``.
+    """
+    script = code
+    if after:
+        script = f"{after}\nimport sys\nsys.stderr.write({MARKER!r} + '\\n')\n{code}"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    lines = proc.stderr.splitlines()
+    if after and MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+
+    costs = defaultdict(int)
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        costs[package] += int(self_us)
+    if proc.returncode != 0:
+        costs["<import failed>"] = 0
+    return dict(costs)
+
+
+def _login_page_seconds():
+    """Time a cold interpreter rendering the login page once."""
+    proc = subprocess.run(
+        [sys.executable, "-c", LOGIN_PAGE_SCRIPT],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return {"seconds": None, "error": True}
+
+
+def build_report(top=10):
+    """Collect import costs per group and the login page render time."""
+    groups = {"Login page (eager)": _importtime(EAGER_IMPORTS)}
+    for label, code in LAZY_GROUPS.items():
+        groups[label] = _importtime(code, after=EAGER_IMPORTS)
+
+    report = {"groups": {}, "login_page": _login_page_seconds()}
+    for label, costs in groups.items():
+        ranked = sorted(costs.items(), key=lambda item: item[1], reverse=True)
+        report["groups"][label] = {
+            "total_ms": round(sum(costs.values()) / 1000, 1),
+            "packages": [{"package": name, "ms": round(us / 1000, 1)} for name, us in ranked[:top]],
+        }
+    return report
+
+
+def print_report(report):
+    """Print the report as a plain text table."""
+    for label, group in report["groups"].items():
+        print(f"\n{label}: {group['total_ms']:.1f} ms")
+        for entry in group["packages"]:
+            print(f"    {entry['package']:<32} {entry['ms']:>9.1f} ms")
+    login = report["login_page"]
+    if login["seconds"] is not None:
+        status = " (script raised)" if login["error"] else ""
+        print(f"\nLogin page first render (cold interpreter): {login['seconds']:.2f} s{status}")
+    else:
+        print("\nLogin page first render: could not be measured")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--top", type=int, default=10, help="packages listed per group")
+    args = parser.parse_args()
+
+    result = build_report(top=args.top)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
@@ -0,0 +1,194 @@
+"""Static snapshot export of a finished REPP project site.
+
+Once a project is customized, the Home, Dashboards and Datasets and
+Presentation pages never change, so they can be written out as plain HTML
+plus content-hashed asset files and served by any static file server or CDN
+without running Streamlit for every viewer.
+"""
+
+import hashlib
+import html
+import io
+import json
+import os
+import shutil
+import zipfile
+from urllib.parse import quote
+
+# Largest width kept for gallery images; bigger uploads are downscaled
+MAX_IMAGE_WIDTH = 1600
+JPEG_QUALITY = 85
+
+# Upload lists in project_data that end up as downloadable files
+DOWNLOAD_SECTIONS = {
+    "dashboards": "Dashboards",
+    "datasets": "Uploaded Datasets",
+    "presentations": "Uploaded Presentations",
+}
+
+SITE_CSS = """
+body { background-color: #fffacd; color: red; font-family: Arial, sans-serif; margin: 0; padding: 20px 20px 80px; line-height: 1.6; }
+h1, h2, h3, h4, h5, h6 { color: red; text-align: center; font-family: 'Comic Sans MS', cursive; margin-bottom: 20px; }
+nav { text-align: center; margin-bottom: 20px; }
+nav a { margin: 0 12px; color: #ff4500; font-weight: bold; text-decoration: none; }
+.gallery img { display: block; max-width: 100%; margin: 10px auto; }
+.gallery figcaption { text-align: center; color: grey; font-size: 14px; }
+.downloads a { display: inline-block; margin: 6px; padding: 8px 16px; background-color: #ff4500; color: white; border-radius: 12px; text-decoration: none; }
+.footer-container { position: fixed; bottom: 0; left: 0; width: 100%; background-color: #ffd700; text-align: center; padding: 10px 0; border-top: 3px solid red; }
+.footer-container h3 { margin: 0; font-size: 14px; }
+"""
+
+PAGES = [
+    ("index.html", "Home"),
+    ("dashboards.html", "Dashboards and Datasets"),
+    ("presentation.html", "Presentation"),
+]
+
+
+def _file_bytes(uploaded_file):
+    """Return the raw bytes of an uploaded file (Streamlit UploadedFile or file-like)."""
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+
+def _hashed_name(name, data):
+    """Build a content-addressed file name such as ``report.3f2a9c1b7d4e.csv``."""
+    stem, ext = os.path.splitext(os.path.basename(name))
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f"{stem}.{digest}{ext.lower()}"
+
+
+def optimize_image(data, name):
+    """Downscale and re-encode an image; returns ``(bytes, name)``.
+
+    Falls back to the original bytes when Pillow cannot decode the file or
+    the re-encoded version is not smaller.
+    """
+    from PIL import Image
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception:
+        return data, name
+
+    if image.width > MAX_IMAGE_WIDTH:
+        height = round(image.height * MAX_IMAGE_WIDTH / image.width)
+        image = image.resize((MAX_IMAGE_WIDTH, height), Image.LANCZOS)
+
+    stem, ext = os.path.splitext(name)
+    out = io.BytesIO()
+    if ext.lower() == ".png":
+        image.save(out, format="PNG", optimize=True)
+    else:
+        ext = ".jpg"
+        image.convert("RGB").save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+    optimized = out.getvalue()
+    if len(optimized) >= len(data):
+        return data, name
+    return optimized, stem + ext
+
+
+def _write_asset(assets_dir, name, data, manifest):
+    """Write one asset under its hashed name and record it in the manifest."""
+    hashed = _hashed_name(name, data)
+    with open(os.path.join(assets_dir, hashed), "wb") as f:
+        f.write(data)
+    manifest["assets"][hashed] = {"name": name, "size": len(data)}
+    return "assets/" + quote(hashed)
+
+
+def _page(title, body, css_href):
+    """Wrap page body HTML in the shared layout and navigation."""
+    nav = " ".join(f'<a href="{href}">{html.escape(label)}</a>' for href, label in PAGES)
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)} - REPP</title>
+<link rel="stylesheet" href="{css_href}">
+</head>
+<body>
+<nav>{nav}</nav>
+{body}
+<div class="footer-container"><h3>&copy; 2024 Syed Faizan. All rights reserved.</h3></div>
+</body>
+</html>
+"""
+
+
+def export_static_site(project_data, home_fragment, out_dir):
+    """Snapshot ``project_data`` into a self-contained static site in ``out_dir``.
+
+    ``home_fragment`` is the cached Home page HTML from the app, so the
+    export looks exactly like the live Home page. Returns the manifest that
+    is also written to ``out_dir/manifest.json``.
+    """
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    assets_dir = os.path.join(out_dir, "assets")
+    os.makedirs(assets_dir)
+
+    manifest = {"pages": [href for href, _ in PAGES], "assets": {}}
+
+    # Stylesheet is content hashed as well so it can be cached forever
+    css_href = _write_asset(assets_dir, "style.css", SITE_CSS.encode("utf-8"), manifest)
+
+    # Home page with the gallery
+    gallery = []
+    for image in project_data.get("images", []):
+        data, name = optimize_image(_file_bytes(image), image.name)
+        src = _write_asset(assets_dir, name, data, manifest)
+        gallery.append(
+            f'<figure><img src="{src}" alt="{html.escape(image.name)}" loading="lazy">'
+            f"<figcaption>{html.escape(image.name)}</figcaption></figure>"
+        )
+    gallery_html = "\n".join(gallery) if gallery else "<p>No images uploaded.</p>"
+    home_body = f'{home_fragment}\n<h3>Gallery</h3>\n<div class="gallery">\n{gallery_html}\n</div>'
+
+    # Download links for dashboards, datasets and presentations
+    sections = {}
+    for key, heading in DOWNLOAD_SECTIONS.items():
+        links = []
+        for uploaded in project_data.get(key, []):
+            href = _write_asset(assets_dir, uploaded.name, _file_bytes(uploaded), manifest)
+            links.append(f'<a href="{href}" download="{html.escape(uploaded.name)}">Download {html.escape(uploaded.name)}</a>')
+        empty = f"<p>No {key} uploaded.</p>"
+        sections[key] = f'<h3>{heading}</h3>\n<div class="downloads">{"".join(links) or empty}</div>'
+
+    dashboards_body = "<h1>Dashboards and Datasets</h1>\n" + sections["dashboards"] + "\n" + sections["datasets"]
+
+    google_slides = project_data.get("google_slides", "")
+    if google_slides:
+        slides_html = f'<iframe src="{html.escape(google_slides)}" width="100%" height="600px" frameborder="0" allowfullscreen></iframe>'
+    else:
+        slides_html = "<p>No Google Slides link provided.</p>"
+    presentation_body = "<h1>Presentation</h1>\n" + sections["presentations"] + "\n<h3>Embedded Google Slides</h3>\n" + slides_html
+
+    bodies = {"index.html": home_body, "dashboards.html": dashboards_body, "presentation.html": presentation_body}
+    for href, title in PAGES:
+        with open(os.path.join(out_dir, href), "w", encoding="utf-8") as f:
+            f.write(_page(title, bodies[href], css_href))
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def zip_site(out_dir, zip_path=None):
+    """Pack an exported site directory into a zip for downloading.
+
+    Writes ``zip_path`` and returns it when given, so the archive stays on
+    disk rather than in memory; otherwise returns the zip bytes.
+    """
+    target = zip_path or io.BytesIO()
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as archive:
+        for root, _, files in os.walk(out_dir):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                archive.write(path, os.path.relpath(path, out_dir))
+    return zip_path or target.getvalue()
@@ -0,0 +1,81 @@
+"""Background warmup of the Query Assistant when a server process starts.
+
+Without it the first user of a fresh worker pays for the LangChain/FAISS
+imports, loading the document index from disk and the tiktoken encoder.
+start() runs all of that in a daemon thread instead, REPP_WARMUP_DELAY
+seconds later so the login page that triggered it renders first:
+
+* imports rag_pipeline (with chunker and conversation) and reranker
+* initializes the tiktoken encoder and the chunker's token tables
+* loads the REPP_WARMUP_TOP most opened uploaded documents into the shared
+  index cache, under the document hash get_document_index() looks up
+* runs one search per index so FAISS and memory-mapped vectors are paged in
+
+Set REPP_WARMUP=0 to disable it.
+"""
+
+import os
+import threading
+import time
+
+WARMUP_ENABLED = os.getenv("REPP_WARMUP", "1") not in ("", "0")
+WARMUP_TOP = int(os.getenv("REPP_WARMUP_TOP", "4"))
+WARMUP_DELAY = float(os.getenv("REPP_WARMUP_DELAY", "2"))
+
+
+def warm():
+    """Run the warmup in the calling thread; returns the keys loaded."""
+    import numpy as np
+
+    import chunker
+    import rag_pipeline
+    import reranker  # noqa: F401  imported for its import cost only
+    from rag_metrics import METRICS
+
+    chunker.default_chunker()
+
+    targets = [
+        (doc_hash, os.path.join(rag_pipeline.INDEX_DIR, doc_hash))
+        for doc_hash in rag_pipeline.most_used(WARMUP_TOP)
+    ]
+    # Never evict what warmup itself just loaded
+    targets = targets[:rag_pipeline.INDEX_CACHE_SIZE]
+
+    loaded = []
+    embeddings = None
+    for key, path in targets:
+        try:
+            if embeddings is None:
+                embeddings = rag_pipeline.default_embeddings()
+            with METRICS.stage("warmup") as span:
+                vector_store = rag_pipeline.preload_index(key, path, embeddings)
+                # A search by vector needs no embedding API call
+                probe = np.zeros(vector_store.index.d, dtype="float32").tolist()
+                vector_store.similarity_search_with_score_by_vector(probe, k=1)
+                span.items = vector_store.index.ntotal
+            loaded.append(key)
+        except Exception as err:
+            print(f"Warmup could not load index {path}: {err}")
+    return loaded
+
+
+def _run():
+    start = time.perf_counter()
+    try:
+        loaded = warm()
+    except Exception as err:
+        print(f"Warmup failed: {err}")
+        return
+    print(f"Warmup loaded {len(loaded)} indexes in {time.perf_counter() - start:.1f}s")
+
+
+def start():
+    """Start the warmup thread, unless disabled; returns the thread or None."""
+    if not WARMUP_ENABLED:
+        return None
+    # A timer, so the imports do not compete with the first script run
+    thread = threading.Timer(WARMUP_DELAY, _run)
+    thread.name = "repp-warmup"
+    thread.daemon = True
+    thread.start()
+    return thread